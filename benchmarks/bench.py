@@ -0,0 +1,410 @@
+import argparse
+import fnmatch
+import json
+import pathlib
+import platform
+import time
+from typing import Callable, Dict, List, NamedTuple  # noqa
+from tetris.autoplay import best_placement
+from tetris.game import Game, Map, Tetrimino, ITetrimino, OTetrimino, \
+    TTetrimino, check_collision, map_data
+from tetris.planner import Planner
+from tetris.sim import simulate
+from tetris.terminal import render_cells, scale_cells
+from tests.helpers import add_block, make_game
+
+BASELINE = pathlib.Path(__file__).parent / 'baseline.json'
+
+# Slowdown over the baseline, in percent, which counts as a regression.
+THRESHOLD = 25.0
+
+# Times a benchmark slower than the threshold is measured again before
+# it counts as a regression. The fastest measurement is kept.
+RETRIES = 2
+
+# A benchmark runs its operation n times and returns the seconds spent
+# on it, so that per-iteration setup can be left out of the timing.
+Bench = Callable[[int], float]
+
+BENCHMARKS: Dict[str, Bench] = {}
+
+
+def bench(name: str) -> Callable[[Bench], Bench]:
+    def register(f: Bench) -> Bench:
+        BENCHMARKS[name] = f
+        return f
+    return register
+
+
+class Result(NamedTuple):
+    name: str
+    seconds: float  # Best time per operation
+    ops: int  # Operations per timed run
+    speed: float  # Time per operation in calibration loop iterations
+    noise: float  # Spread of the timed runs, in percent
+
+
+# Iterations of the calibration loop, and timed runs of a calibration.
+CALIBRATION_OPS = 10000
+CALIBRATION_RUNS = 10
+
+
+def calibration_loop(n: int) -> float:
+    """
+    Interpreter-bound loop which benchmarks are measured against, so that
+    results compare across machines and changes of the CPU speed.
+    """
+    started = time.perf_counter()
+    table: Dict[int, List[int]] = {}
+    total = 0
+    for i in range(n):
+        key = i & 255
+        cells = table.get(key)
+        if cells is None:
+            cells = table[key] = []
+        cells.append(total)
+        if len(cells) > 4:
+            cells.pop(0)
+        total = (total + i * 7) & 0xffff
+    return time.perf_counter() - started
+
+
+def calibrate() -> float:
+    """
+    Seconds per iteration of the calibration loop, at the current speed of
+    the machine.
+    """
+    return min(calibration_loop(CALIBRATION_OPS)
+               for _ in range(CALIBRATION_RUNS)) / CALIBRATION_OPS
+
+
+def fill_lines(game: Game, lines: int) -> None:
+    """
+    Fill the bottom `lines` rows of the field with O pieces, leaving a gap
+    for a tetrimino on top.
+    """
+    bottom = game.map.height - 2
+    for y in range(bottom - lines + 1, bottom + 1, 2):
+        for x in range(1, game.map.width - 1, 2):
+            add_block(game, OTetrimino(x, y))
+    add_block(game, ITetrimino(2, bottom - lines))
+
+
+def clear_pieces(game: Game) -> None:
+    """
+    Take every piece but the player out of the field.
+    """
+    for obj in game.field.children:
+        if isinstance(obj, Tetrimino) and obj is not game.player:
+            game.field.clear(obj)
+
+
+@bench('check_collision')
+def bench_check_collision(n: int) -> float:
+    a = TTetrimino(4, 4)
+    b = TTetrimino(4, 6)
+    a.collidable = b.collidable = True
+    started = time.perf_counter()
+    for _ in range(n):
+        check_collision(a, b)
+    return time.perf_counter() - started
+
+
+@bench('game.move')
+def bench_game_move(n: int) -> float:
+    game = make_game()
+    player = game.player
+    started = time.perf_counter()
+    for _ in range(n // 2):
+        game.move(player, dx=-1, dy=0)
+        game.move(player, dx=1, dy=0)
+    return time.perf_counter() - started
+
+
+@bench('tetrimino.rotate')
+def bench_rotate(n: int) -> float:
+    game = make_game()
+    game.move(game.player, dx=0, dy=5)
+    rotate = game.player.rotate
+    started = time.perf_counter()
+    for _ in range(n):
+        rotate()
+    return time.perf_counter() - started
+
+
+@bench('field.children')
+def bench_children(n: int) -> float:
+    game = make_game()
+    fill_lines(game, 8)
+    field = game.field
+    started = time.perf_counter()
+    for _ in range(n):
+        field.children
+    return time.perf_counter() - started
+
+
+@bench('game.check_tetris')
+def bench_check_tetris(n: int) -> float:
+    elapsed = 0.0
+    game = make_game()
+    for _ in range(n):
+        clear_pieces(game)
+        fill_lines(game, 4)
+        started = time.perf_counter()
+        game.check_tetris()
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+@bench('field.remove_line')
+def bench_remove_line(n: int) -> float:
+    elapsed = 0.0
+    game = make_game()
+    y = game.map.height - 2
+    for _ in range(n):
+        clear_pieces(game)
+        fill_lines(game, 2)
+        started = time.perf_counter()
+        game.field.remove_line(y)
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+@bench('field.restructure')
+def bench_restructure(n: int) -> float:
+    elapsed = 0.0
+    game = make_game()
+    for _ in range(n):
+        clear_pieces(game)
+        fill_lines(game, 2)
+        game.field.remove_line(game.map.height - 2)
+        started = time.perf_counter()
+        game.field.restructure()
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+@bench('autoplay.best_placement')
+def bench_best_placement(n: int) -> float:
+    game = make_game()
+    fill_lines(game, 8)
+    started = time.perf_counter()
+    for _ in range(n):
+        best_placement(game)
+    return time.perf_counter() - started
+
+
+@bench('planner.plan')
+def bench_plan(n: int) -> float:
+    """
+    Time per lookahead plan, with the placement searches cached after the
+    first one.
+    """
+    game = make_game()
+    fill_lines(game, 8)
+    with Planner(depth=2, workers=1) as planner:
+        started = time.perf_counter()
+        for _ in range(n):
+            planner.plan(game)
+        return time.perf_counter() - started
+
+
+@bench('scale_cells')
+def bench_scale_cells(n: int) -> float:
+    cells = make_game().map.cells
+    started = time.perf_counter()
+    for _ in range(n):
+        scale_cells(cells)
+    return time.perf_counter() - started
+
+
+@bench('render_cells')
+def bench_render_cells(n: int) -> float:
+    game = make_game()
+    cells = game.map.cells
+    terminal = game.terminal
+    started = time.perf_counter()
+    for _ in range(n):
+        render_cells(terminal, cells)
+    return time.perf_counter() - started
+
+
+@bench('map.load_from')
+def bench_map_load(n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        Map().load_from(s=map_data)
+    return time.perf_counter() - started
+
+
+@bench('headless.frame')
+def bench_frames(n: int) -> float:
+    """
+    Time per rendered frame of a headless game.
+    """
+    elapsed = 0.0
+    frames = 0
+    seed = 0
+    while frames < n:
+        stats = simulate(seed, policy='random', duration=60)
+        elapsed += stats.wall_time
+        frames += stats.frames
+        seed += 1
+    return elapsed * n / frames
+
+
+@bench('headless.piece')
+def bench_pieces(n: int) -> float:
+    """
+    Time per placed piece of a headless game.
+    """
+    elapsed = 0.0
+    pieces = 0
+    seed = 0
+    while pieces < n:
+        stats = simulate(seed, policy='drop', duration=60)
+        elapsed += stats.wall_time
+        pieces += stats.pieces
+        seed += 1
+    return elapsed * n / pieces
+
+
+def measure(name: str, min_time: float=0.2, repeat: int=5) -> Result:
+    """
+    Find a number of operations which takes at least `min_time` and time
+    `repeat` runs of them. Every run is also timed in iterations of the
+    calibration loop, measured right before and after it, and the median
+    of those is the speed.
+    """
+    f = BENCHMARKS[name]
+    n = 1
+    while True:
+        elapsed = f(n)
+        if elapsed >= min_time or n >= 1 << 24:
+            break
+        n *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed * 1.2))
+    times = []
+    speeds = []
+    calibration = calibrate()
+    for _ in range(repeat):
+        elapsed = f(n) / n
+        after = calibrate()
+        times.append(elapsed)
+        speeds.append(elapsed / ((calibration + after) / 2))
+        calibration = after
+    speeds.sort()
+    speed = speeds[len(speeds) // 2]
+    noise = (speed / speeds[0] - 1) * 100 if speeds[0] > 0 else 0.0
+    return Result(name, min(times), n, speed, noise)
+
+
+def change(result: Result, base: Result) -> float:
+    """
+    Slowdown of `result` over `base`, in percent.
+    """
+    return (result.speed / base.speed - 1) * 100
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f}{unit}'
+    return f'{seconds / 1e-9:.0f}ns'
+
+
+def load_baseline(path: pathlib.Path) -> Dict[str, Result]:
+    if not path.exists():
+        return {}
+    with path.open() as f:
+        data = json.load(f)
+    # Baselines of plain seconds predate calibration and are left out.
+    return {name: Result(name, r['seconds'], 0, r['speed'], r['noise'])
+            for name, r in data['results'].items() if isinstance(r, dict)}
+
+
+def save_baseline(path: pathlib.Path, results: List[Result]) -> None:
+    data = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': {r.name: {'seconds': r.seconds, 'speed': r.speed,
+                             'noise': r.noise} for r in results},
+    }
+    with path.open('w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def parse_args(argv: List[str]=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='benchmarks')
+    parser.add_argument('-k', metavar='PATTERN', default='*',
+                        help='Only run benchmarks matching PATTERN.')
+    parser.add_argument('--baseline', type=pathlib.Path, default=BASELINE,
+                        help='Baseline file.')
+    parser.add_argument('--save', action='store_true',
+                        help='Write the results to the baseline file.')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Fail if a benchmark is slower than the '
+                             'baseline by more than this percentage.')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='Minimum seconds per timed run.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs.')
+    parser.add_argument('--retries', type=int, default=RETRIES,
+                        help='Times a benchmark over the threshold is '
+                             'measured again before it counts as a '
+                             'regression.')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]=None) -> int:
+    args = parse_args(argv)
+    baseline = load_baseline(args.baseline)
+    results = []
+    regressions = []
+    noisy = []
+    for name in BENCHMARKS:
+        if not fnmatch.fnmatch(name, args.k):
+            continue
+        result = measure(name, args.min_time, args.repeat)
+        base = baseline.get(name)
+        measured = 1
+        while base and measured <= args.retries \
+                and change(result, base) > args.threshold:
+            again = measure(name, args.min_time, args.repeat)
+            if again.speed < result.speed:
+                result = again
+            measured += 1
+        results.append(result)
+        line = (f'{name:<24} {format_time(result.seconds):>10}/op '
+                f'{result.speed:10.1f} iters/op ±{result.noise:4.1f}%')
+        if base:
+            line += f' {change(result, base):+7.1f}%'
+            if measured > 1:
+                line += f' (best of {measured})'
+            if change(result, base) <= args.threshold:
+                pass
+            elif result.noise > args.threshold:
+                # The runs spread more than the threshold, e.g. on a busy
+                # machine, so the slowdown tells nothing.
+                line += ' NOISY'
+                noisy.append(name)
+            else:
+                line += ' REGRESSION'
+                regressions.append(name)
+        print(line, flush=True)
+
+    if noisy:
+        print(f'{len(noisy)} benchmarks were too noisy to compare: '
+              f'{", ".join(noisy)}')
+    if args.save:
+        if args.k != '*':
+            saved = load_baseline(args.baseline)
+            saved.update({r.name: r for r in results})
+            results = [saved[k] for k in sorted(saved)]
+        save_baseline(args.baseline, results)
+        print(f'Saved {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} benchmarks regressed by more than '
+              f'{args.threshold}%: {", ".join(regressions)}')
+        return 1
+    return 0
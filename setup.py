@@ -55,6 +55,7 @@ setup(
     tests_require=tests_require,
     extras_require={
         'test': tests_require,
+        'numpy': ['numpy'],
     },
     dependency_links=dependency_links,
     license='MIT',
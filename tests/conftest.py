@@ -0,0 +1,8 @@
+import pytest
+from tetris.game import Game
+from tests.helpers import make_game
+
+
+@pytest.fixture
+def game() -> Game:
+    return make_game()
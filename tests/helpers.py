@@ -0,0 +1,21 @@
+from tetris.game import Game, GameObject
+from tetris.headless import HeadlessBackend
+from tetris.terminal import Terminal
+
+
+def make_game(seed: int=0, **kwargs) -> Game:
+    """
+    Make a headless game with a player in the field. `kwargs` are passed
+    to Game.
+    """
+    game = Game(Terminal(backend=HeadlessBackend()), seed=seed, **kwargs)
+    game.spawn()
+    return game
+
+
+def add_block(game: Game, obj: GameObject) -> None:
+    """
+    Add `obj` to the field of `game` as a locked piece.
+    """
+    obj.collidable = True
+    game.add(obj)
@@ -0,0 +1,96 @@
+import pytest
+from tetris.autoplay import Autoplayer, Board, TranspositionCache, \
+    Weights, best_placement, placements
+from tetris.exceptions import StatusCode
+from tetris.game import Game, ITetrimino, OTetrimino, FPS
+from tetris.headless import HeadlessBackend
+from tetris.sim import simulate
+from tetris.terminal import Terminal
+from tests.helpers import add_block
+
+
+def test_evaluate(game):
+    board = Board(game.field, game.player)
+    bottom = game.map.height - 2
+    flat = ITetrimino.rotations[0]
+
+    # An I lying on the floor in columns 1-4.
+    assert board.evaluate(flat, 2, bottom, Weights(1, 0, 0, 0)) == (4, 0)
+    assert board.evaluate(flat, 2, bottom, Weights(0, 0, 0, 1)) == (1, 0)
+    assert board.evaluate(flat, 2, bottom, Weights(0, 0, 1, 0)) == (0, 0)
+
+    # One row up, it covers a hole in every column.
+    assert board.evaluate(flat, 2, bottom - 1, Weights(1, 0, 0, 0)) == (8, 0)
+    assert board.evaluate(flat, 2, bottom - 1, Weights(0, 0, 1, 0)) == (4, 0)
+
+
+def test_placements_clear_lines(game):
+    bottom = game.map.height - 2
+    for x in range(1, 9, 2):
+        add_block(game, OTetrimino(x, bottom - 1))
+    board = Board(game.field, game.player)
+
+    found = placements(board, OTetrimino, 0, 4, 1)
+    assert sorted(p.x for p in found) == list(range(1, 10))
+    best = max(found, key=lambda p: p.score)
+    assert (best.x, best.y, best.lines) == (9, bottom - 1, 2)
+    assert best.score == board.evaluate(OTetrimino.rotations[0], 9,
+                                        bottom - 1)[0]
+
+
+def test_board_hash(game):
+    board = Board(game.field, game.player)
+    # The player and the next player are left out.
+    game.field.clear(game.player)
+    game.field.clear(game.next_player)
+    assert board.hash == game.field.hash
+
+
+def test_transposition_cache(game):
+    cache = TranspositionCache(size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert (len(cache), cache.hits, cache.misses, cache.evictions) == \
+        (2, 3, 1, 1)
+
+    cache = TranspositionCache()
+    best = best_placement(game)
+    assert best_placement(game, cache=cache) == best
+    assert best_placement(game, cache=cache) == best
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Searches with other weights do not get the entries of these.
+    weights = Weights(height=0, lines=0, holes=0, bumpiness=1)
+    other = best_placement(game, weights)
+    assert other != best
+    assert best_placement(game, weights, cache) == other
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_autoplayed_game():
+    stats = simulate(0, policy='auto', duration=30)
+    assert stats.status == StatusCode.OK
+    assert stats.lines > 0
+
+
+def test_autoplay_interval():
+    with pytest.raises(ValueError):
+        Autoplayer(interval=-1)
+    game = Game(Terminal(backend=HeadlessBackend()), seed=0)
+    game.autoplayer = Autoplayer()
+    placed = []
+    spawn = game.spawn
+
+    def record_spawn():
+        placed.append(game.scheduler.tick)
+        spawn()
+    game.spawn = record_spawn
+    game.run(2)
+    # At most one piece per tick, and the game stops on time.
+    assert len(placed) == len(set(placed)) > 1
+    assert game.scheduler.tick <= 2 * FPS + 1
+    assert game.frames > 1
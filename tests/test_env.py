@@ -0,0 +1,47 @@
+import pytest
+from tetris.game import ITetrimino, OTetrimino, TETRIMINOS
+
+np = pytest.importorskip('numpy')
+
+from tetris.env import BatchEnv, Action, Observation  # noqa
+
+
+def test_step_moves_pieces():
+    env = BatchEnv(3, seed=0, gravity=100)
+    env.kind[:] = TETRIMINOS.index(OTetrimino)
+    env.x[:], env.y[:] = 4, 0
+    obs, rewards, dones = env.step([Action.Left, Action.Right, Action.Noop])
+    assert env.x.tolist() == [3, 5, 4]
+    assert (obs == Observation.Piece).sum(axis=(1, 2)).tolist() == [4, 4, 4]
+
+    obs, rewards, dones = env.step([Action.Drop] * 3)
+    assert env.pieces.tolist() == [1, 1, 1]
+    assert not dones.any()
+    # The dropped pieces rest on the floor.
+    assert obs[1, env.height - 3:env.height - 1, 5:7].all()
+
+
+def test_line_clear():
+    env = BatchEnv(2, seed=0, gravity=100)
+    floor = env.height - 2
+    env.stack[:, floor, 1:7] = True
+    env.stack[:, floor - 1, 1] = True
+    env.kind[:] = TETRIMINOS.index(ITetrimino)
+    env.rotation[:] = 0
+    env.x[:], env.y[:] = 8, 0
+    _, rewards, dones = env.step([Action.Drop, Action.Noop])
+    assert rewards.tolist() == [1, 0]
+    assert env.lines.tolist() == [1, 0]
+    # The block above the cleared line moved down.
+    assert env.stack[0, floor].tolist() == [False, True] + [False] * 10
+    assert env.stack[0].sum() == 1
+
+
+def test_game_over_resets():
+    env = BatchEnv(1, seed=0)
+    dones = 0
+    for _ in range(500):
+        _, _, done = env.step([Action.Drop])
+        dones += int(done[0])
+    assert dones > 0
+    assert env.pieces[0] < 500
@@ -1,4 +1,16 @@
-from tetris.game import GameObject
+from typing import List, Tuple
+from unittest.mock import Mock
+from tetris.game import GameObject, Field, Map, OTetrimino, ITetrimino, \
+    STetrimino, TTetrimino, LTetrimino, map_data, rotation_states, np
+from tetris.terminal import cell_positions
+
+
+def make_field() -> Field:
+    m = Map()
+    m.load_from(s=map_data)
+    field = Field(m.width, m.height + 2)
+    field.set_map(m)
+    return field
 
 
 def test_renderable():
@@ -10,4 +22,186 @@ def test_game_object():
 
 
 def test_collision():
-    pass
+    field = make_field()
+    o = OTetrimino(x=1, y=1)
+    field.update(o)
+    assert field.collision(o, dx=-1) is field.map
+    assert field.collision(o, dx=1) is None
+    assert field.collision(o, dx=3, dy=-2) is None
+
+    other = OTetrimino(x=3, y=1)
+    field.update(other)
+    assert field.collision(o, dx=1) is other
+    other.collidable = False
+    assert field.collision(o, dx=1) is None
+
+
+def test_field_bitboard():
+    field = make_field()
+    assert field.occupied(0, 1)
+    assert not field.occupied(1, 1)
+    assert field.get(0, 1).obj is field.map
+
+    o = OTetrimino(x=4, y=5)
+    field.update(o)
+    assert field.occupied(4, 5) and field.occupied(5, 6)
+    assert field.get(5, 6).obj is o
+    field.clear(o)
+    assert not field.occupied(4, 5)
+    assert field.get(4, 5) is None
+
+
+def test_field_hash():
+    def zobrist(field: Field) -> int:
+        h = 0
+        for y, line in enumerate(field.rows):
+            for x in range(field.width):
+                if line >> x & 1:
+                    h ^= field.keys[y * field.width + x]
+        return h
+
+    field = make_field()
+    empty = field.hash
+    assert empty == zobrist(field) != 0
+
+    o = OTetrimino(x=4, y=5)
+    field.update(o)
+    assert field.hash == zobrist(field) != empty
+    # Only the occupancy is hashed, not the owners.
+    other = make_field()
+    for x, y in cell_positions(o.make_cells()):
+        other.set_at(x, y, other.map)
+    assert other.hash == field.hash
+
+    y = field.map.height - 2
+    field.update(ITetrimino(x=1, y=y))
+    field.update(ITetrimino(x=5, y=y))
+    field.update(OTetrimino(x=9, y=y-1))
+    assert field.clear_lines() == 1
+    assert field.hash == zobrist(field)
+    field.clear(o)
+    field.remove_line(field.map.height - 1)
+    assert field.hash == zobrist(field)
+
+
+def test_field_check_filled():
+    field = make_field()
+    y = field.map.height - 2
+    assert not field.check_filled(y=y)
+    # The map's floor alone is not a line to be cleared.
+    assert not field.check_filled(y=field.map.height - 1)
+    field.update(ITetrimino(x=1, y=y))
+    field.update(ITetrimino(x=5, y=y))
+    assert not field.check_filled(y=y)
+    field.update(OTetrimino(x=9, y=y-1))
+    assert field.check_filled(y=y)
+
+
+def test_field_children():
+    field = make_field()
+    assert field.children == [field.map]
+    a = OTetrimino(x=4, y=5)
+    b = ITetrimino(x=3, y=10)
+    field.update(a)
+    field.update(b)
+    assert field.children == [field.map, a, b]
+    assert field.counts[id(a)] == 4
+
+    field.clear_at(4, 5)
+    assert field.counts[id(a)] == 3
+    field.clear(b)
+    assert field.children == [field.map, a]
+
+
+def test_rotation_states():
+    assert len(ITetrimino.rotations) == 4
+    assert ITetrimino.rotations[1] == ((0, 0), (0, 1), (0, -1), (0, -2))
+    assert len(OTetrimino.rotations) == 1
+    for cls in (ITetrimino, TTetrimino, STetrimino):
+        # Four rotations bring the piece back to its initial state.
+        assert rotation_states(cls.shape, 5)[4] == cls.rotations[0]
+
+
+def test_rotate():
+    field = make_field()
+    game = Mock(field=field, player=None)
+    t = TTetrimino(x=4, y=5)
+    t.parent = game
+    field.update(t)
+    t.rotate()
+    assert t.rotation == 1
+    assert [(c.x, c.y) for c in t.cells] == [(5, 5), (5, 6), (6, 5), (5, 4)]
+    assert field.get(6, 5).obj is t
+    assert field.get(4, 5) is None
+
+    # Against the left wall the rotation is kicked to the right.
+    i = ITetrimino(x=1, y=8)
+    i.parent = game
+    field.update(i)
+    i.rotate()
+    i.rotate()
+    assert sorted(c.x for c in i.cells) == [1, 2, 3, 4]
+
+
+def test_drop_distance():
+    field = make_field()
+    floor = field.map.height - 1
+    i = ITetrimino(x=1, y=2)
+    field.update(i)
+    assert field.drop_distance(i) == floor - 3
+
+    o = OTetrimino(x=3, y=15)
+    field.update(o)
+    assert field.drop_distance(i) == 15 - 3
+    o.collidable = False
+    assert field.drop_distance(i) == floor - 3
+
+
+def test_clear_lines():
+    def play(use_numpy: bool) -> List[List[Tuple[int, int]]]:
+        field = make_field()
+        field.use_numpy = use_numpy
+        y = field.map.height - 2
+        pieces = [ITetrimino(x=1, y=y), ITetrimino(x=5, y=y),
+                  OTetrimino(x=9, y=y-1), LTetrimino(x=1, y=y-1),
+                  ITetrimino(x=2, y=y-4)]
+        for p in pieces:
+            field.update(p)
+        assert field.clear_lines() == 1
+        assert not field.check_filled(y=y)
+        return [[(c.x, c.y) for c in p.cells] for p in pieces]
+
+    y = 19
+    expected = [[], [],
+                [(9, y+1), (10, y+1)],
+                [(3, y+1), (1, y+1), (2, y+1)],
+                [(3, y-2), (2, y-2), (4, y-2), (5, y-2)]]
+    assert play(use_numpy=False) == expected
+    if np is not None:
+        assert play(use_numpy=True) == expected
+
+
+def test_clear_lines_parity():
+    def play(use_numpy: bool) -> Tuple[int, List[List[Tuple[int, int]]]]:
+        field = make_field()
+        field.use_numpy = use_numpy
+        y = field.map.height - 2
+        # Bottom two rows filled but for a 2x2 gap at x=5, covered by a
+        # non-collidable piece.
+        pieces = [OTetrimino(x=x, y=y-1) for x in (1, 3, 7, 9)]
+        pieces.append(OTetrimino(x=5, y=y-1))
+        pieces[-1].collidable = False
+        # A non-collidable piece over a block of another piece.
+        pieces.append(ITetrimino(x=1, y=y-2))
+        pieces.append(OTetrimino(x=1, y=y-3))
+        pieces[-1].collidable = False
+        for p in pieces:
+            field.update(p)
+        assert not field.check_filled(y=y)
+        lines = field.clear_lines()
+        return lines, [[(c.x, c.y) for c in p.cells] for p in pieces]
+
+    lines, cells = play(use_numpy=False)
+    assert lines == 0
+    if np is not None:
+        assert play(use_numpy=True) == (lines, cells)
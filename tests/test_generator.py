@@ -0,0 +1,25 @@
+from tetris.generator import PieceGenerator, Randomizer
+
+
+def test_same_seed_same_sequence():
+    for randomizer in Randomizer:
+        a = PieceGenerator(7, seed=42, randomizer=randomizer)
+        b = PieceGenerator(7, seed=42, randomizer=randomizer)
+        assert [a.next() for _ in range(500)] == \
+            [b.next() for _ in range(500)]
+    assert PieceGenerator(7, seed=1).preview(20) != \
+        PieceGenerator(7, seed=2).preview(20)
+
+
+def test_bag():
+    gen = PieceGenerator(7, seed=0, randomizer=Randomizer.Bag)
+    for _ in range(50):
+        assert sorted(gen.next() for _ in range(7)) == list(range(7))
+
+
+def test_preview():
+    gen = PieceGenerator(7, seed=3, chunk=8)
+    coming = gen.preview(30)
+    assert len(coming) == 30
+    assert [gen.next() for _ in range(30)] == coming
+    assert gen.count == 30
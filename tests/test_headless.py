@@ -0,0 +1,70 @@
+from tetris.game import Game, FPS
+from tetris.generator import Randomizer
+from tetris.headless import HeadlessBackend, VirtualClock, EVENT_KEY
+from tetris.terminal import Terminal, MouseKey, Color
+
+
+def test_framebuffer():
+    backend = HeadlessBackend(width=4, height=2, capture=True)
+    backend.change_cell(1, 0, ord('x'), Color.Red, Color.Default)
+    backend.change_cell(2, 1, ord(' '), Color.Default, Color.White)
+    backend.change_cell(9, 9, ord('y'), Color.Red, Color.Default)
+    backend.present()
+    assert backend.frames == [[' x', '  #']]
+    backend.clear()
+    assert backend.screen() == ['', '']
+
+
+def test_scripted_input():
+    clock = VirtualClock()
+    script = [(0.5, MouseKey.Left, None), (2.0, None, 'q')]
+    backend = HeadlessBackend(script=script, clock=clock)
+    assert backend.peek_event(100) is None
+    assert clock() == 0.1
+    event = backend.peek_event(1000)
+    assert event[0] == EVENT_KEY
+    assert event[2] == MouseKey.Left.value
+    assert clock() == 0.5
+
+    backend.feed(MouseKey.Enter)
+    assert backend.peek_event(0)[2] == MouseKey.Enter.value
+    assert backend.poll_event()[1] == 'q'
+    assert clock() == 2.0
+    assert backend.poll_event() is None
+
+
+def test_headless_game():
+    script = [(t / 10, MouseKey.Space, None) for t in range(1, 500)]
+    backend = HeadlessBackend(script=script, capture=True)
+    with Game(Terminal(backend=backend), seed=1) as game:
+        game.run()
+    assert backend.closed
+    assert backend.frames
+    # The virtual clock is not slowed down by the frame rate.
+    assert game.scheduler.tick > FPS
+    assert any('#' in line for line in backend.frames[-1])
+
+
+def test_seeded_games_are_identical():
+    def play(seed):
+        script = [(t / 4, key, None) for t, key in
+                  enumerate([MouseKey.Left, MouseKey.Enter, MouseKey.Right,
+                             MouseKey.Space] * 40, 1)]
+        backend = HeadlessBackend(script=script, capture=True)
+        with Game(Terminal(backend=backend), seed=seed,
+                  randomizer=Randomizer.Bag) as game:
+            game.run()
+        return backend.frames
+
+    assert play(7) == play(7)
+
+
+def test_rotation_renders():
+    game = Game(Terminal(backend=HeadlessBackend()), seed=0)
+    game.spawn()
+    game.move(game.player, dx=0, dy=2)
+    game.render()
+    assert not game.dirty
+    game.dispatch(MouseKey.Enter.value)
+    assert game.player.rotation == 1
+    assert game.dirty
@@ -0,0 +1,59 @@
+from tetris.game import Game, FPS
+from tetris.headless import HeadlessBackend
+from tetris.instrument import Histogram, FrameProfiler, Phase
+from tetris.sim import drop_policy
+from tetris.terminal import Terminal
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_histogram():
+    hist = Histogram(buckets=(0.001, 0.01))
+    for seconds in (0.0005, 0.002, 0.003, 0.5):
+        hist.record(seconds)
+    assert hist.counts.tolist() == [1, 2, 1]
+    assert hist.count == 4
+    assert hist.max == 0.5
+    assert hist.percentile(50) == 0.01
+    assert hist.percentile(100) == 0.5
+
+
+def test_nested_phases():
+    clock = FakeClock()
+    profiler = FrameProfiler(budget=0.5, clock=clock)
+    profiler.begin_frame()
+    profiler.push(Phase.Input)
+    clock.t += 1.0
+    profiler.pop()
+    profiler.push(Phase.Gravity)
+    clock.t += 0.25
+    profiler.push(Phase.Move)
+    clock.t += 0.5
+    profiler.pop()
+    profiler.pop()
+    profiler.end_frame()
+
+    assert profiler.last[Phase.Gravity] == 0.25
+    assert profiler.last[Phase.Move] == 0.5
+    # Waiting for input does not count towards the frame time.
+    assert profiler.frame.total == 0.75
+    assert profiler.stutters == 1
+    assert profiler.culprits[Phase.Move] == 1
+
+
+def test_profiled_game():
+    profiler = FrameProfiler(budget=1 / FPS)
+    backend = HeadlessBackend(script=drop_policy(0), capture=True)
+    with Game(Terminal(backend=backend), seed=0, profiler=profiler,
+              overlay=True) as game:
+        game.run(5)
+    assert profiler.frame.count == profiler.phases[Phase.Input].count
+    assert profiler.phases[Phase.Render].count == game.frames
+    assert profiler.phases[Phase.LineClear].count == game.placed
+    assert any('stutters' in line for line in backend.frames[-1])
@@ -0,0 +1,72 @@
+from unittest.mock import patch
+from tetris.logging import create_logger, setup_logger, stop_listeners, \
+    IndentFormatter, Level, PLANE_FORMATTER
+
+
+def test_queued_logger(tmp_path):
+    path = tmp_path / 'queued.log'
+    logger = create_logger('test_queued')
+    setup_logger(logger, level=Level.INFO, file=path,
+                 formatter=PLANE_FORMATTER, queued=True)
+    logger.info('%d lines', 4)
+    logger.debug('not written')
+    stop_listeners()
+    assert path.read_text() == '4 lines\n'
+
+
+def test_queued_mutable_args(tmp_path):
+    path = tmp_path / 'mutable.log'
+    logger = create_logger('test_mutable')
+    setup_logger(logger, level=Level.INFO, file=path,
+                 formatter=PLANE_FORMATTER, queued=True)
+    row = [1, 2]
+    logger.info('row %s', row)
+    logger.info('%(row)s', {'row': row})
+    row.append(3)
+    stop_listeners()
+    assert path.read_text() == 'row [1, 2]\n[1, 2]\n'
+
+
+def test_colorized_level_functions():
+    logger = create_logger('test_color')
+    logger.setLevel(Level.INFO)
+    assert logger.info == logger._log.info
+
+    logger.color = True
+    info = logger.info
+    assert info != logger._log.info
+    assert logger.info is info
+
+    with patch('tetris.logging.colored') as colored:
+        logger.debug('%s', 'disabled')
+        assert not colored.called
+
+    logger.color = False
+    assert logger.info == logger._log.info
+
+
+def test_indent_formatter(tmp_path):
+    def play(name, queued):
+        path = tmp_path / f'{name}.log'
+        logger = create_logger(name)
+        setup_logger(logger, level=Level.DEBUG, file=path,
+                     formatter=IndentFormatter('%(indent)s%(message)s'),
+                     queued=queued)
+
+        def inner():
+            logger.debug('inner')
+
+        def outer():
+            logger.debug('outer')
+            inner()
+
+        logger.debug('top')
+        outer()
+        logger.color = True
+        outer()
+        stop_listeners()
+        return path.read_text().splitlines()
+
+    expected = ['top', '.outer', '..inner', '.outer', '..inner']
+    assert play('test_indent', queued=False) == expected
+    assert play('test_indent_queued', queued=True) == expected
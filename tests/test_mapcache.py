@@ -0,0 +1,66 @@
+import pytest
+from tetris import mapcache
+from tetris.game import Map, map_data
+from tetris.terminal import cell_positions
+
+
+@pytest.fixture(autouse=True)
+def clear_maps():
+    mapcache._maps.clear()
+    yield
+    mapcache._maps.clear()
+
+
+def test_parse():
+    m = mapcache.parse('\n*  *\n\n****\n')
+    assert (m.width, m.height, m.rows) == (4, 2, [0b1001, 0b1111])
+    assert m.digest == mapcache.digest('\n*  *\n\n****\n')
+
+
+def test_dump_load():
+    m = mapcache.parse(map_data)
+    data = mapcache.compile_map(map_data)
+    assert len(data) == mapcache.HEADER.size + 2 * m.height
+    assert mapcache.load(data) == m
+    with pytest.raises(ValueError):
+        mapcache.load(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        mapcache.load(data[:-1])
+
+
+def test_cached(tmp_path):
+    m = mapcache.cached(map_data, tmp_path)
+    path = tmp_path / (m.digest.hex() + mapcache.SUFFIX)
+    assert mapcache.load_file(path) == m
+    assert mapcache.cached(map_data, tmp_path) is m
+
+    mapcache._maps.clear()
+    assert mapcache.cached(map_data, tmp_path) == m
+    # Broken cache files are compiled again.
+    mapcache._maps.clear()
+    path.write_bytes(b'TTMP')
+    assert mapcache.cached(map_data, tmp_path) == m
+    assert mapcache.load_file(path) == m
+
+
+def test_map_load(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setattr(mapcache, 'CACHE_DIR', cache_dir)
+    text = tmp_path / 'map.txt'
+    text.write_text('***\n* *\n***\n')
+    m = Map()
+    m.load(text)
+    assert (m.width, m.height) == (3, 3)
+    # Map files are compiled into the cache, the built-in map is not.
+    assert [p.suffix for p in cache_dir.iterdir()] == [mapcache.SUFFIX]
+    Map().load_from(s=map_data)
+    assert len(list(cache_dir.iterdir())) == 1
+    assert sorted(cell_positions(m.cells)) == \
+        [(x, y) for x in range(3) for y in range(3) if (x, y) != (1, 1)]
+
+    compiled = tmp_path / 'map.ttmap'
+    compiled.write_bytes(mapcache.compile_map(text.read_text()))
+    other = Map()
+    other.load(compiled)
+    assert other.rows == m.rows
+    assert list(cell_positions(other.cells)) == list(cell_positions(m.cells))
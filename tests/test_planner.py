@@ -0,0 +1,87 @@
+import time
+from tetris.autoplay import Autoplayer, Board, player_placements
+from tetris.exceptions import StatusCode
+from tetris.game import Game, ITetrimino, OTetrimino, SPAWN
+from tetris.headless import HeadlessBackend
+from tetris.planner import Planner, pick, search, spawn_position
+from tetris.terminal import Terminal
+from tests.helpers import add_block, make_game
+
+
+def test_board_place(game):
+    bottom = game.map.height - 2
+    for x in range(1, 9, 2):
+        add_block(game, OTetrimino(x, bottom - 1))
+    add_block(game, ITetrimino(2, bottom - 2))
+    board = Board(game.field, game.player)
+
+    placed = board.place(OTetrimino.rotations[0], 9, bottom - 1)
+    add_block(game, OTetrimino(9, bottom - 1))
+    assert game.field.clear_lines() == 2
+    expected = Board(game.field, game.player)
+    assert placed.rows == expected.rows
+    assert placed.columns == expected.columns
+    assert placed.stack == expected.stack
+    assert placed.hash == expected.hash
+    assert board.hash != placed.hash
+
+
+def test_spawn_position(game):
+    board = Board(game.field, game.player)
+    x, y = SPAWN
+    assert spawn_position(board, OTetrimino) == (x, y + 1)
+    assert spawn_position(board, ITetrimino) == (x + 1, y + 1)
+    add_block(game, OTetrimino(x, y + 2))
+    assert spawn_position(Board(game.field, game.player), OTetrimino) is None
+
+
+def test_search(game):
+    board, found = player_placements(game)
+    cls = type(game.player)
+    state = (game.player.rotation + found[0].rotations) % cls.states
+    pieces = [OTetrimino, ITetrimino]
+    scores = search(board, cls, state, found[0], pieces)
+    assert len(scores) == 3
+    assert scores[0] == found[0].score
+    # No level is started after the deadline.
+    assert search(board, cls, state, found[0], pieces,
+                  deadline=time.monotonic() - 1) == [found[0].score]
+
+
+def test_pick():
+    lost = float('-inf')
+    assert pick([[1.0, 2.0], [3.0]]) == 0
+    # A placement which tops out loses to a shallower one.
+    assert pick([[1.0, 2.0, lost], [0.0, 1.0]]) == 1
+    assert pick([[5.0, lost], [0.0]]) == 1
+    # Unless every placement tops out.
+    assert pick([[1.0, 2.0, lost], [3.0, lost]]) == 0
+
+
+def test_plan():
+    game = make_game(seed=3)
+    with Planner(depth=2, workers=1) as planner:
+        placement = planner.plan(game)
+    with Planner(depth=2, workers=2) as planner:
+        assert planner.plan(game) == placement
+    _, found = player_placements(game)
+    assert placement in found
+
+
+def test_plan_budget():
+    game = make_game(seed=3)
+    _, found = player_placements(game)
+    # Out of time, only the first placement is searched, one level deep.
+    with Planner(depth=4, workers=1, budget=0) as planner:
+        assert planner.plan(game) == found[0]
+    # On a pool, the searches which did not finish in time are left out.
+    with Planner(depth=4, workers=2, budget=0) as planner:
+        assert planner.plan(game) in found
+
+
+def test_planned_game():
+    game = Game(Terminal(backend=HeadlessBackend()), seed=0)
+    with Planner(depth=1, workers=1) as planner:
+        game.autoplayer = Autoplayer(interval=1, planner=planner)
+        assert game.run(5) == StatusCode.OK
+    assert game.lines > 0
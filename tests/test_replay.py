@@ -0,0 +1,47 @@
+import pytest
+from tetris.cli import parse_args
+from tetris.game import Game
+from tetris.generator import Randomizer
+from tetris.headless import HeadlessBackend
+from tetris.replay import Recorder, Recording, load, parse, replay
+from tetris.sim import random_policy
+from tetris.terminal import Terminal, cell_positions
+
+
+def field_state(game):
+    return [sorted(cell_positions(o.make_cells()))
+            for o in game.field.children]
+
+
+def test_recorder(tmp_path):
+    path = tmp_path / 'game.ttr'
+    with path.open('wb') as f:
+        recorder = Recorder(f, 42, Randomizer.Bag)
+        recorder.record(3, 0xFFFF - 20)
+        recorder.record(7, 0, 'q')
+        recorder.close(9)
+    assert load(path) == Recording(42, Randomizer.Bag,
+                                   [(3, 0xFFFF - 20, None), (7, 0, 'q')], 9)
+    with pytest.raises(ValueError):
+        parse(b'X' * 64)
+
+
+def test_replay(tmp_path):
+    path = tmp_path / 'game.ttr'
+    backend = HeadlessBackend(script=random_policy(5))
+    with Game(Terminal(backend=backend), seed=5) as game:
+        game.recorder = Recorder.open(path, game)
+        game.run(60)
+        game.recorder.close(game.scheduler.tick)
+
+    replayed = replay(load(path))
+    assert replayed.placed == game.placed
+    assert replayed.scheduler.tick == game.scheduler.tick
+    assert field_state(replayed) == field_state(game)
+
+
+def test_no_autoplay_recording():
+    # Moves of the autoplayer are not key events and would not replay.
+    with pytest.raises(SystemExit):
+        parse_args(['--record', 'game.ttr', '--autoplay'])
+    assert parse_args(['--record', 'game.ttr']).record
@@ -0,0 +1,47 @@
+from tetris.scheduler import Scheduler
+
+
+class Clock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_ticks():
+    clock = Clock()
+    s = Scheduler(40, clock)
+    assert s.tick_at(100.0) == 0
+    assert s.tick_at(101.0) == 40
+    assert s.time_of(20) == 100.5
+    clock.t = 100.25
+    assert s.timeout(20) == 0.25
+    assert s.timeout(5) == 0.0
+    assert s.timeout(None) is None
+
+
+def test_pop_in_order():
+    s = Scheduler(40, Clock())
+    s.schedule('gravity', 40)
+    s.schedule('lock', 20)
+    s.schedule('render', 40)
+    assert s.next_tick() == 20
+    assert s.pop(10) is None
+    assert s.pop(100) == (20, 'lock')
+    assert s.pop(100) == (40, 'gravity')
+    assert s.pop(100) == (40, 'render')
+    assert s.pop(100) is None
+    assert s.tick == 40
+
+    # Rescheduling a pending event puts it after the ones scheduled since.
+    s.schedule('gravity', 60)
+    s.schedule('lock', 60)
+    s.schedule('gravity', 60)
+    assert s.pop(100) == (60, 'lock')
+    assert s.pop(100) == (60, 'gravity')
+
+    s.schedule('lock', 50)
+    s.cancel('lock')
+    assert not s.scheduled('lock')
+    assert s.next_tick() is None
@@ -0,0 +1,32 @@
+from tetris.exceptions import StatusCode
+from tetris.game import Game
+from tetris.headless import HeadlessBackend
+from tetris.sim import POLICIES, simulate, run_batch
+from tetris.terminal import Terminal
+
+
+def test_simulate():
+    stats = simulate(0, policy='drop', duration=5)
+    assert stats.status == StatusCode.OK
+    assert stats.pieces > 0
+    assert stats.frames > 0
+    assert simulate(0, policy='drop', duration=5)[:-1] == stats[:-1]
+
+
+def test_drop_policy_fills_board():
+    backend = HeadlessBackend(script=POLICIES['drop'](0))
+    with Game(Terminal(backend=backend), seed=0) as game:
+        assert game.run() == StatusCode.Exit
+    # The game only ends once the stack blocks the spawned piece.
+    assert game.field.collision(game.player) is not None
+    assert game.placed >= 20
+    filled = sum(bin(game.field.row(y) & ~game.field.map_row(y)).count('1')
+                 for y in range(game.map.height))
+    assert filled >= game.placed * 4 - 4
+
+
+def test_run_batch():
+    batch = run_batch(3, workers=2, seed=10, duration=5)
+    assert [g.seed for g in batch.games] == [10, 11, 12]
+    assert batch.pieces == sum(g.pieces for g in batch.games)
+    assert 'pieces/sec' in batch.summary()
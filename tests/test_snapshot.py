@@ -0,0 +1,124 @@
+import functools
+import pytest
+from tetris.exceptions import Exit
+from tetris.game import Game, Text, map_data
+from tetris.headless import HeadlessBackend, VirtualClock
+from tetris.mapcache import CompiledMap, SUFFIX, compile_map, \
+    dump as dump_map
+from tetris.replay import Recorder, load as load_recording
+from tetris.sim import random_policy
+from tetris.snapshot import dump, restore, save, load
+from tetris.sparse import SparseField
+from tetris.terminal import Terminal, cell_positions
+
+
+def game_state(game):
+    return (game.placed, game.lines, game.scheduler.tick,
+            dict(game.scheduler.events),
+            [game.field.row(y) for y in range(game.field.height)],
+            [game.field.map_row(y) for y in range(game.field.height)],
+            [sorted(cell_positions(o.make_cells()))
+             for o in game.field.children],
+            type(game.player), type(game.next_player),
+            game.pieces.preview(8))
+
+
+def play(game, events, end=None):
+    time_of = game.scheduler.time_of
+    try:
+        for tick, key, uch in events:
+            game.update(time_of(tick))
+            game.dispatch(key, uch)
+        if end is not None:
+            game.update(time_of(end))
+    except Exit:
+        pass
+
+
+@pytest.mark.parametrize('seed', [1, 6])
+def test_restored_game_continues(tmp_path, seed):
+    path = tmp_path / 'game.ttr'
+    backend = HeadlessBackend(script=random_policy(seed))
+    with Game(Terminal(backend=backend), seed=seed) as game:
+        game.recorder = Recorder.open(path, game)
+        game.run(60)
+        game.recorder.close(game.scheduler.tick)
+    recording = load_recording(path)
+    half = len(recording.events) // 2
+
+    a = Game(Terminal(backend=HeadlessBackend()), clock=VirtualClock(),
+             seed=recording.seed, randomizer=recording.randomizer)
+    a.start()
+    play(a, recording.events[:half])
+    b = restore(dump(a))
+    assert game_state(b) == game_state(a)
+
+    play(a, recording.events[half:], recording.end)
+    play(b, recording.events[half:], recording.end)
+    assert game_state(b) == game_state(a)
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / 'game.snap'
+    backend = HeadlessBackend(script=random_policy(2))
+    with Game(Terminal(backend=backend), seed=2) as game:
+        game.run(5)
+        save(game, path)
+    assert game_state(load(path)) == game_state(game)
+    with pytest.raises(ValueError):
+        restore(b'X' * 64)
+
+
+def test_large_field(tmp_path):
+    # More positions than a 16-bit index can tell apart.
+    size = 300
+    side = 1 | 1 << (size - 1)
+    m = CompiledMap(size, size, [side] * (size - 1) + [(1 << size) - 1],
+                    b'\0' * 32)
+    path = tmp_path / ('large' + SUFFIX)
+    path.write_bytes(dump_map(m))
+
+    def make_game():
+        return Game(Terminal(backend=HeadlessBackend()), seed=0,
+                    clock=VirtualClock(), mapfile=path)
+    game = make_game()
+    game.spawn()
+    game.hard_drop()
+    restored = restore(dump(game), make_game())
+    assert game_state(restored) == game_state(game)
+
+
+def test_sparse_field_and_texts():
+    def make_game():
+        return Game(Terminal(backend=HeadlessBackend()), seed=0,
+                    clock=VirtualClock(),
+                    field_cls=functools.partial(SparseField, chunk=8))
+    game = make_game()
+    game.start()
+    game.hard_drop()
+    label = Text(x=0, y=game.map.height + 1, text='ラベル')
+    game.add(label)
+    restored = restore(dump(game), make_game())
+    assert restored.field.chunk == 8
+    assert game_state(restored) == game_state(game)
+    assert [o.text for o in restored.field.children
+            if isinstance(o, Text)] == ['GAME START', 'ラベル']
+    assert restored.message.text == 'GAME START'
+    # The field has to be of the same kind.
+    with pytest.raises(ValueError):
+        restore(dump(game))
+
+
+def test_other_map(tmp_path):
+    path = tmp_path / ('other' + SUFFIX)
+    # Same size as the built-in map, without the walls of the top row.
+    path.write_bytes(compile_map(map_data.replace('***      ***',
+                                                  '*          *')))
+    game = Game(Terminal(backend=HeadlessBackend()), seed=0)
+    game.start()
+    other = Game(Terminal(backend=HeadlessBackend()), seed=0, mapfile=path)
+    assert (other.map.width, other.map.height) == \
+        (game.map.width, game.map.height)
+    with pytest.raises(ValueError):
+        restore(dump(game), other)
+    assert game_state(restore(dump(game))) == game_state(game)
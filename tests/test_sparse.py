@@ -0,0 +1,148 @@
+import functools
+from tetris import mapcache, snapshot
+from tetris.autoplay import Autoplayer, Board
+from tetris.game import Game, Field, ITetrimino, OTetrimino
+from tetris.headless import HeadlessBackend
+from tetris.sim import POLICIES
+from tetris.sparse import SparseField
+from tetris.terminal import Terminal
+from tests.helpers import add_block, make_game
+
+
+def rows(field):
+    return [field.row(y) for y in range(field.height)]
+
+
+def play(field_cls, policy):
+    backend = HeadlessBackend(script=POLICIES[policy](0))
+    game = Game(Terminal(backend=backend), seed=0, field_cls=field_cls)
+    if policy == 'auto':
+        game.autoplayer = Autoplayer(interval=1)
+    status = game.run(30)
+    return (status, game.placed, game.lines), game.field
+
+
+def test_same_as_field():
+    for policy in ('drop', 'auto'):
+        stats, dense = play(Field, policy)
+        sparse_stats, sparse = play(SparseField, policy)
+        assert sparse_stats == stats
+        assert rows(dense) == rows(sparse)
+        assert [dense.column(x) for x in range(dense.width)] == \
+            [sparse.column(x) for x in range(sparse.width)]
+        assert dense.hash == sparse.hash
+        boards = [Board(field) for field in (dense, sparse)]
+        assert boards[0].rows == boards[1].rows
+        assert boards[0].stack == boards[1].stack
+        assert boards[0].hash == boards[1].hash
+
+
+def test_chunks(game):
+    field = SparseField(200, 100, chunk=8)
+    field.set_map(game.map)
+    chunks = len(field.chunks)
+    o = OTetrimino(100, 50)
+    field.update(o)
+    assert len(field.chunks) == chunks + 1
+    assert field.occupied(100, 50) and field.get(101, 51).obj is o
+    assert field.owner(101, 51) is o and field.owner(102, 51) is None
+    assert field.surface(None, 100, 40) == 50
+    field.clear(o)
+    assert len(field.chunks) == chunks
+    assert not field.occupied(100, 50) and field.get(100, 50) is None
+
+
+def test_clear_lines():
+    games = [make_game(field_cls=cls) for cls in (Field, SparseField)]
+    for game in games:
+        bottom = game.map.height - 2
+        for x in range(1, 9, 2):
+            add_block(game, OTetrimino(x, bottom - 1))
+        add_block(game, ITetrimino(2, bottom - 2))
+        add_block(game, OTetrimino(9, bottom - 1))
+        assert game.field.check_filled(y=bottom)
+        assert game.field.clear_lines() == 2
+        assert not game.field.check_filled(y=bottom)
+    dense, sparse = (game.field for game in games)
+    assert rows(dense) == rows(sparse)
+    assert [dense.surface(None, x, 0) for x in range(dense.width)] == \
+        [sparse.surface(None, x, 0) for x in range(sparse.width)]
+
+
+def test_clear_touched_chunks():
+    game = make_game(field_cls=functools.partial(SparseField, chunk=8))
+    field = game.field
+    below = OTetrimino(1, game.map.height - 3)
+    add_block(game, below)
+    for x in range(1, 11, 2):
+        add_block(game, OTetrimino(x, 10))
+    assert field.filled_rows == {10, 11, game.map.height - 1}
+    updated = []
+    update = field.update
+
+    def record_update(obj):
+        updated.append(obj)
+        update(obj)
+    field.update = record_update
+    assert field.clear_lines() == 2
+    # The pieces in the tile rows below the lines are left alone.
+    assert below not in updated
+    assert field.filled_rows == set()
+    assert field.clear_lines() == 0
+
+
+def test_large_map(tmp_path):
+    size = 10000
+    wall = (1 << size) - 1
+    side = 1 | 1 << (size - 1)
+    m = mapcache.CompiledMap(size, size, [wall] + [side] * (size - 2) + [wall],
+                             b'\0' * 32)
+    path = tmp_path / ('large' + mapcache.SUFFIX)
+    path.write_bytes(mapcache.dump(m))
+
+    game = make_game(field_cls=SparseField, mapfile=path)
+    field = game.field
+    # Only the chunks of the walls and the pieces are allocated.
+    assert len(field.chunks) < 4 * size // 64 + 4
+    # The map does not fall, so its chunks are kept.
+    last = (size - 1) // 64
+    corner = field.chunks[last, last]
+    game.gravity()
+    assert field.chunks[last, last] is corner
+    o = OTetrimino(size // 2, size // 2)
+    add_block(game, o)
+    game.move(o, dx=0, dy=size)
+    assert o.cells[-1].y == size - 2
+    board = Board(field, game.player)
+    assert board.wells == list(range(1, size - 1))
+    assert board.stack[size // 2 - 1] == 0b11 << (size - 3)
+
+
+def test_tall_map(tmp_path):
+    width, height = 12, 40
+    side = 1 | 1 << (width - 1)
+    m = mapcache.CompiledMap(width, height,
+                             [side] * (height - 1) + [(1 << width) - 1],
+                             b'\0' * 32)
+    path = tmp_path / ('tall' + mapcache.SUFFIX)
+    path.write_bytes(mapcache.dump(m))
+    for field_cls in (Field, SparseField):
+        game = make_game(field_cls=field_cls, mapfile=path)
+        game.system_message('GAME START')
+        assert game.message.cells.y[0] == height
+        player = game.player
+        game.hard_drop()
+        # The piece lands on the floor, not on the message.
+        assert max(c.y for c in player.cells) == height - 2
+        assert game.field.map_row(height - 1) == m.rows[-1]
+
+
+def test_snapshot():
+    game = make_game(field_cls=SparseField)
+    for x in range(1, 9, 2):
+        add_block(game, OTetrimino(x, game.map.height - 3))
+    restored = snapshot.restore(snapshot.dump(game),
+                                make_game(field_cls=SparseField))
+    assert isinstance(restored.field, SparseField)
+    assert rows(restored.field) == rows(game.field)
+    assert restored.field.hash == game.field.hash
@@ -1,4 +1,6 @@
-from tetris.terminal import Terminal, Vector2
+from unittest.mock import Mock
+from tetris.terminal import Terminal, Vector2, CellBuffer, Color, Shape, \
+    Renderable, SCALEX, SCALEY, DEFAULT_SQUARE, cell_positions, scale_cells
 
 
 class MockTermbox:
@@ -20,3 +22,121 @@ def test_vector():
     v1 = Vector2(1, 2)
     v2 = Vector2(1, 2)
     assert v1 == v2
+
+
+def test_cell_buffer():
+    buf = CellBuffer()
+    buf.append(1, 2, Color.Red, Color.Blue)
+    buf.append(3, 4, c=ord('*'))
+    assert len(buf) == 2
+    assert list(cell_positions(buf)) == [(1, 2), (3, 4)]
+    cell = buf[0]
+    assert (cell.x, cell.y, cell.fg, cell.bg) == (1, 2, Color.Red, Color.Blue)
+    assert [c.c for c in buf] == [Shape.Default.value, ord('*')]
+
+    assert len(scale_cells(buf)) == 2 * SCALEX * SCALEY
+
+    version = buf.version
+    buf.clear()
+    assert len(buf) == 0
+    assert buf.version > version
+
+
+class RecordingTermbox:
+    def __init__(self):
+        self.cells = {}
+
+    def change_cell(self, x, y, c, fg, bg):
+        self.cells[(x, y)] = (c, fg, bg)
+
+    def close(self):
+        pass
+
+
+def test_render_static():
+    term = Mock(tb=RecordingTermbox(), width=80, height=24)
+    term.change_cell = term.tb.change_cell
+
+    class Static(Renderable):
+        static = True
+
+        def __init__(self):
+            super().__init__()
+            self.cells = CellBuffer()
+            self.cells.append(1, 2, Color.Red, Color.Blue)
+
+        def make_cells(self):
+            return self.cells
+
+    obj = Static()
+    obj.render(term)
+    assert len(term.tb.cells) == SCALEX * SCALEY
+    assert term.tb.cells[(1 * SCALEX, 2 * SCALEY)][2] == Color.Blue
+    scaled = obj._scaled
+    obj.render(term)
+    assert obj._scaled is scaled
+
+    obj.cells.append(3, 2)
+    obj.render(term)
+    assert obj._scaled is not scaled
+    assert (3 * SCALEX, 2 * SCALEY) in term.tb.cells
+
+    # Cells outside of the terminal are left out.
+    obj.cells.append(80 // SCALEX, 2)
+    obj.cells.append(1, 24 // SCALEY)
+    obj.render(term)
+    assert len(obj._scaled) == 2 * SCALEX * SCALEY
+
+
+def test_diff_present():
+    class Termbox(RecordingTermbox):
+        presented = 0
+
+        def present(self):
+            self.presented += 1
+
+    class DiffTerminal(Terminal):
+        TermboxCls = Termbox
+
+    term = DiffTerminal()
+    term.change_cell(1, 2, ord('a'), Color.Red, Color.Blue)
+    term.change_cell(3, 4, ord('b'), Color.Red, Color.Blue)
+    assert term.present()
+    assert term.tb.cells == {(1, 2): (ord('a'), Color.Red, Color.Blue),
+                             (3, 4): (ord('b'), Color.Red, Color.Blue)}
+
+    # Nothing changed, nothing is sent.
+    term.tb.cells.clear()
+    term.change_cell(1, 2, ord('a'), Color.Red, Color.Blue)
+    term.change_cell(3, 4, ord('b'), Color.Red, Color.Blue)
+    assert not term.present()
+    assert term.tb.presented == 1
+    assert term.tb.cells == {}
+
+    # Only the moved cell is redrawn and the vacated one is blanked.
+    term.change_cell(1, 2, ord('a'), Color.Red, Color.Blue)
+    term.change_cell(5, 4, ord('b'), Color.Red, Color.Blue)
+    assert term.present()
+    assert term.tb.cells == {(5, 4): (ord('b'), Color.Red, Color.Blue),
+                             (3, 4): (DEFAULT_SQUARE, Color.Default,
+                                      Color.Default)}
+
+    # Cells off the left edge are clipped instead of wrapping onto the
+    # row above.
+    term.tb.cells.clear()
+    term.change_cell(1, 2, ord('a'), Color.Red, Color.Blue)
+    term.change_cell(5, 4, ord('b'), Color.Red, Color.Blue)
+    term.change_cell(-1, 3, ord('c'), Color.Red, Color.Blue)
+    term.change_cell(1 << 16, 3, ord('c'), Color.Red, Color.Blue)
+    assert not term.present()
+    assert term.tb.cells == {}
+
+    # Attributes in fg do not spill into bg.
+    bold = Color.Red | 0x0100
+    term.change_cell(1, 2, ord('a'), bold, Color.Blue)
+    term.change_cell(5, 4, ord('b'), Color.Red, Color.Blue)
+    assert term.present()
+    assert term.tb.cells == {(1, 2): (ord('a'), bold, Color.Blue)}
+    term.change_cell(1, 2, ord('a'), Color.Red, Color.Blue | 0x0200)
+    term.change_cell(5, 4, ord('b'), Color.Red, Color.Blue)
+    assert term.present()
@@ -0,0 +1,481 @@
+import collections
+import copy
+from typing import Any, Deque, Hashable, List, NamedTuple, Optional, \
+    Tuple, Type  # noqa
+from .game import Field, Game, GameObject, Tetrimino, Offsets, \
+    splitmix64, zobrist_keys
+from .terminal import cell_positions
+
+
+class Weights(NamedTuple):
+    """
+    Weights of the placement heuristic.
+    """
+    height: float  # Sum of the column heights
+    lines: float  # Cleared lines
+    holes: float  # Empty cells under the top of their column
+    bumpiness: float  # Sum of the height differences of adjacent columns
+
+
+# Weights tuned for the classic 10 column board.
+WEIGHTS = Weights(height=-0.510066, lines=0.760666, holes=-0.35663,
+                  bumpiness=-0.184483)
+
+
+class Placement(NamedTuple):
+    rotations: int  # Number of rotations from the current state
+    down: int  # Rows to move down after rotating, to clear the top walls
+    dx: int  # Columns to shift after moving down
+    x: int  # Final position of the first cell
+    y: int
+    lines: int
+    score: float
+
+
+def popcount(n: int) -> int:
+    return bin(n).count('1')
+
+
+# Number of entries of a TranspositionCache.
+CACHE_SIZE = 1 << 16
+
+# Cells up to which Board.place looks the Zobrist keys up in a table.
+KEY_TABLE_SIZE = 1 << 16
+
+
+class TranspositionCache:
+    """
+    Bounded LRU cache of search results, keyed by a board hash and the
+    piece searched on it. The least recently used entry is evicted when
+    the cache is full.
+    """
+    def __init__(self, size: int=CACHE_SIZE) -> None:
+        self.size = size
+        self.entries: 'collections.OrderedDict[Hashable, Any]' = \
+            collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Get the entry of `key`, or None.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, entry: Any) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class Board:
+    """
+    Bitboard of the map area of a field, without the player and the
+    objects it does not collide with. `hash` is the Zobrist hash of the
+    field without them.
+    """
+    def __init__(self, field: Field, player: GameObject=None) -> None:
+        m = field.map
+        # Rows below the map are past its floor and out of reach.
+        height = min(m.height, field.height)
+        self.stride = field.width
+        self.width = m.width
+        self.height = height
+        rows = [field.row(y) for y in range(height)]
+        columns = [field.column(x) & ((1 << height) - 1)
+                   for x in range(m.width)]
+        h = field.hash
+        for obj in field.children:
+            if obj is not player and obj.collidable:
+                continue
+            for x, y in cell_positions(obj.make_cells()):
+                if field.owner(x, y) is obj:
+                    h ^= field.key(x, y)
+                    if 0 <= x < m.width and y < height:
+                        rows[y] &= ~(1 << x)
+                        columns[x] &= ~(1 << y)
+        self.rows = rows
+        self.columns = columns
+        self.hash = h
+
+        self.floor = m.height - 1
+        self.full = (1 << m.width) - 1
+        map_rows = [field.map_row(y) for y in range(height)]
+        self.map_rows = map_rows
+        # Playable columns are the ones with no wall above the floor.
+        self.wells = [x for x in range(m.width)
+                      if not map_rows[self.floor - 1] >> x & 1]
+        # First row with no wall over the playable columns. Pieces have to
+        # be below it to reach every column.
+        playable = sum(1 << x for x in self.wells)
+        self.top = 0
+        while self.top < self.floor and map_rows[self.top] & playable:
+            self.top += 1
+        # Walls above the floor in each playable column, gathered from the
+        # walls of each row as there are few of them.
+        walls = dict.fromkeys(self.wells, 0)
+        for y in range(self.floor):
+            row = map_rows[y] & playable
+            while row:
+                low = row & -row
+                walls[low.bit_length() - 1] |= 1 << y
+                row ^= low
+        self.walls = [walls[x] for x in self.wells]
+        self.well_index = {x: n for n, x in enumerate(self.wells)}
+        self.set_stack(self.make_stack())
+
+    def make_stack(self) -> List[int]:
+        """
+        Get the blocks above the floor in each playable column, walls
+        excluded.
+        """
+        above_floor = (1 << self.floor) - 1
+        columns = self.columns
+        return [columns[x] & above_floor & ~walls
+                for x, walls in zip(self.wells, self.walls)]
+
+    def set_stack(self, stack: List[int]) -> None:
+        """
+        Set the stack. The height and holes of each column and their totals
+        are computed on the first evaluate, which updates them for the
+        columns a piece touches.
+        """
+        self.stack = stack
+        self.heights: List[int] = None
+
+    def column_stats(self) -> None:
+        floor = self.floor
+        self.heights = heights = []
+        self.holes = holes = []
+        for col in self.stack:
+            if col:
+                h = floor - ((col & -col).bit_length() - 1)
+                holes.append(h - popcount(col))
+            else:
+                h = 0
+                holes.append(0)
+            heights.append(h)
+        self.total_height = sum(heights)
+        self.total_holes = sum(holes)
+        self.bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+
+    def place(self, offsets: Offsets, x: int, y: int) -> 'Board':
+        """
+        Get the board after the piece at (x, y) is locked and the lines it
+        fills are cleared, like Field.clear_lines does.
+        """
+        board = copy.copy(self)
+        rows = list(self.rows)
+        columns = list(self.columns)
+        stride = self.stride
+        size = stride * self.height
+        # Large boards hash without a table of the keys of every cell.
+        key = zobrist_keys(size).__getitem__ if size <= KEY_TABLE_SIZE \
+            else splitmix64
+        h = self.hash
+        for dx, dy in offsets:
+            cx, cy = x + dx, y + dy
+            if 0 <= cy < self.height:
+                rows[cy] |= 1 << cx
+                columns[cx] |= 1 << cy
+                h ^= key(cy * stride + cx)
+        full = self.full
+        cleared = sorted(set(cy for cy in (y + dy for _, dy in offsets)
+                             if 0 <= cy < self.floor
+                             and rows[cy] & full == full))
+        if cleared:
+            old = rows[:cleared[-1] + 1]
+            map_rows = self.map_rows
+            for cy in cleared:
+                # Drop the blocks above the cleared row by one. The walls
+                # and whatever is outside the map stay.
+                blocks = [row & full & ~map_rows[n]
+                          for n, row in enumerate(rows[:cy])]
+                for n in range(cy, 0, -1):
+                    rows[n] = rows[n] & (map_rows[n] | ~full) | blocks[n - 1]
+                rows[0] &= map_rows[0] | ~full
+            for n, row in enumerate(old):
+                changed = row ^ rows[n]
+                while changed:
+                    low = changed & -changed
+                    h ^= key(n * stride + low.bit_length() - 1)
+                    changed ^= low
+            for cx in range(self.width):
+                column = columns[cx] & ~((1 << len(old)) - 1)
+                for n in range(len(old)):
+                    column |= (rows[n] >> cx & 1) << n
+                columns[cx] = column
+        board.rows = rows
+        board.columns = columns
+        board.hash = h
+        board.set_stack(board.make_stack())
+        return board
+
+    def blocked(self, x: int, y: int) -> bool:
+        """
+        Same as Field.obstacle: outside the map is blocked, except above.
+        """
+        if not 0 <= x < self.width or y >= self.height:
+            return True
+        return y >= 0 and bool(self.rows[y] >> x & 1)
+
+    def fits(self, offsets: Offsets, x: int, y: int) -> bool:
+        blocked = self.blocked
+        for dx, dy in offsets:
+            if blocked(x + dx, y + dy):
+                return False
+        return True
+
+    def drop_distance(self, offsets: Offsets, x: int, y: int) -> int:
+        """
+        Get how far a piece at (x, y) can fall, from the column masks.
+        """
+        distance = self.height
+        columns = self.columns
+        for dx, dy in offsets:
+            cx, cy = x + dx, y + dy
+            below = columns[cx] >> (cy + 1) if cy >= 0 \
+                else columns[cx] << -(cy + 1)
+            if below:
+                d = (below & -below).bit_length() - 1
+            else:
+                d = self.height - cy - 1
+            if d < distance:
+                distance = d
+        return distance
+
+    def evaluate(self, offsets: Offsets, x: int, y: int,
+                 weights: Weights=WEIGHTS) -> Tuple[float, int]:
+        """
+        Score the piece locked at (x, y). Return the score and the number
+        of cleared lines.
+        """
+        index = self.well_index
+        added = {}
+        # New stack of the columns the piece lands in.
+        touched = {}
+        for dx, dy in offsets:
+            cx, cy = x + dx, y + dy
+            added[cy] = added.get(cy, 0) | 1 << cx
+            n = index.get(cx)
+            if n is not None:
+                touched[n] = touched.get(n, self.stack[n]) | 1 << cy
+        full = self.full
+        cleared = sorted(cy for cy, bits in added.items()
+                         if 0 <= cy < self.floor
+                         and (self.rows[cy] | bits) & full == full)
+        lines = len(cleared)
+        floor = self.floor
+        if not cleared:
+            # Only the touched columns and their neighbours change.
+            if self.heights is None:
+                self.column_stats()
+            heights = self.heights
+            changed = {}
+            total_height = self.total_height
+            holes = self.total_holes
+            for n, col in touched.items():
+                h = floor - ((col & -col).bit_length() - 1)
+                changed[n] = h
+                total_height += h - heights[n]
+                holes += h - popcount(col) - self.holes[n]
+            bumpiness = self.bumpiness
+            pairs = set(p for n in changed for p in (n - 1, n)
+                        if 0 <= p < len(heights) - 1)
+            for p in pairs:
+                bumpiness += abs(changed.get(p, heights[p])
+                                 - changed.get(p + 1, heights[p + 1])) \
+                    - abs(heights[p] - heights[p + 1])
+            score = weights.height * total_height + weights.lines * lines \
+                + weights.holes * holes + weights.bumpiness * bumpiness
+            return score, lines
+
+        stack = list(self.stack)
+        for n, col in touched.items():
+            stack[n] = col
+        for cy in cleared:
+            # Drop the blocks above the cleared row by one.
+            above = (1 << cy) - 1
+            below = ~((above << 1) | 1)
+            stack = [((col & above) << 1) | (col & below) for col in stack]
+
+        heights = []
+        holes = 0
+        for col in stack:
+            if col:
+                h = floor - ((col & -col).bit_length() - 1)
+                holes += h - popcount(col)
+            else:
+                h = 0
+            heights.append(h)
+        bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+        score = weights.height * sum(heights) + weights.lines * lines \
+            + weights.holes * holes + weights.bumpiness * bumpiness
+        return score, lines
+
+
+def placements(board: Board, cls: Type[Tetrimino], rotation: int, x: int,
+               y: int, weights: Weights=WEIGHTS) -> List[Placement]:
+    """
+    Enumerate the placements a piece of `cls` in `rotation` with its first
+    cell at (x, y) can reach by rotating, moving down, shifting and then
+    dropping. Rotations are tried with the kicks of Tetrimino.rotate.
+
+    Pieces are moved down below the walls of the top rows, so that they
+    can reach every column.
+    """
+    found = []
+    state = rotation
+    for n in range(cls.states):
+        if n:
+            state = (state + 1) % cls.states
+            offsets = cls.rotations[state]
+            for kx, ky in cls.kicks:
+                if board.fits(offsets, x + kx, y + ky):
+                    x += kx
+                    y += ky
+                    break
+            else:
+                break
+        offsets = cls.rotations[state]
+        sy = y
+        while sy + min(oy for _, oy in offsets) < board.top \
+                and board.fits(offsets, x, sy + 1):
+            sy += 1
+        down = sy - y
+        for step in (-1, 1):
+            dx = 0 if step < 0 else 1
+            while board.fits(offsets, x + dx, sy):
+                drop = sy + board.drop_distance(offsets, x + dx, sy)
+                if all(drop + oy >= 0 for _, oy in offsets):
+                    score, lines = board.evaluate(offsets, x + dx, drop,
+                                                  weights)
+                    found.append(Placement(n, down, dx, x + dx, drop, lines,
+                                           score))
+                dx += step
+    return found
+
+
+def ranked_placements(board: Board, cls: Type[Tetrimino], rotation: int,
+                      x: int, y: int, weights: Weights=WEIGHTS,
+                      cache: TranspositionCache=None) -> List[Placement]:
+    """
+    Get the placements of `placements` from the best to the worst, from
+    `cache` if they are in it. Entries are keyed by `weights` as well, so
+    a cache can be shared by searches with different weights.
+    """
+    key = (board.hash, cls, rotation, x, y, weights)
+    if cache is not None:
+        found = cache.get(key)
+        if found is not None:
+            return found
+    found = sorted(placements(board, cls, rotation, x, y, weights),
+                   key=lambda p: p.score, reverse=True)
+    if cache is not None:
+        cache.put(key, found)
+    return found
+
+
+def player_placements(game: Game, weights: Weights=WEIGHTS,
+                      cache: TranspositionCache=None
+                      ) -> Tuple[Optional[Board], List[Placement]]:
+    """
+    Get the board of `game` without its player, and the placements of the
+    player on it from the best to the worst. The board is None if the
+    player is not a whole piece.
+    """
+    player = game.player
+    if not isinstance(player, Tetrimino) or not player.shape \
+            or len(player.cells) != len(player.shape):
+        return None, []
+    board = Board(game.field, player)
+    pivot = player.cells[0]
+    found = ranked_placements(board, type(player), player.rotation, pivot.x,
+                              pivot.y, weights, cache)
+    return board, found
+
+
+def best_placement(game: Game, weights: Weights=WEIGHTS,
+                   cache: TranspositionCache=None) -> Optional[Placement]:
+    """
+    Find the best placement of the player of `game`.
+    """
+    _, found = player_placements(game, weights, cache)
+    return found[0] if found else None
+
+
+class Autoplayer:
+    """
+    Plays the game by itself.
+
+    When a piece spawns, the best placement is looked up and the moves
+    leading to it are played through the scheduler, one every `interval`
+    ticks, or all at once if `interval` is 0. Either way, the first move
+    of a piece comes at least one tick after it spawns, so that frames
+    are rendered and keys are read between pieces. Placements are looked
+    ahead with `planner` if given, see tetris.planner.Planner.
+    """
+    def __init__(self, weights: Weights=WEIGHTS, interval: int=0,
+                 cache: TranspositionCache=None, planner: Any=None) -> None:
+        if interval < 0:
+            raise ValueError(f'Negative autoplay interval {interval}')
+        self.weights = weights
+        self.interval = interval
+        self.cache = TranspositionCache() if cache is None else cache
+        self.planner = planner
+        self.actions: Deque[str] = collections.deque()
+
+    def on_spawn(self, game: Game) -> None:
+        self.actions.clear()
+        if self.planner:
+            placement = self.planner.plan(game)
+        else:
+            placement = best_placement(game, self.weights, self.cache)
+        if placement is not None:
+            self.actions.extend(['rotate'] * placement.rotations)
+            self.actions.extend(['down'] * placement.down)
+            step = 'right' if placement.dx > 0 else 'left'
+            self.actions.extend([step] * abs(placement.dx))
+        self.actions.append('drop')
+        game.scheduler.schedule('autoplay',
+                                game.scheduler.tick + max(self.interval, 1))
+
+    def step(self, game: Game) -> None:
+        """
+        Play the next action, or all of them without an interval.
+        """
+        while self.actions:
+            action = self.actions.popleft()
+            if action == 'rotate':
+                game.player.rotate()
+            elif action == 'down':
+                game.move(game.player, dx=0, dy=1)
+            elif action == 'left':
+                game.move(game.player, dx=-1, dy=0)
+            elif action == 'right':
+                game.move(game.player, dx=1, dy=0)
+            else:
+                # Spawns the next piece, which plans again.
+                game.hard_drop()
+                return
+            if self.interval:
+                game.scheduler.schedule(
+                    'autoplay', game.scheduler.tick + self.interval)
+                return
@@ -1,23 +1,194 @@
+import argparse
+import pathlib
 import sys
+import time
 import traceback
+from typing import List  # noqa
 from .logging import setup_logger, Level, PLANE_FORMATTER
-from .terminal import logger as term_logger
-from .game import Game, Exit, logger as game_logger
+from .terminal import Terminal, logger as term_logger
+from .headless import HeadlessBackend
+from .generator import Randomizer
+from .game import Game, Field, Exit, FPS, logger as game_logger
+from .instrument import FrameProfiler
+from .autoplay import Autoplayer
+from .planner import Planner
+from .sparse import SparseField
+from . import sim, replay, mapcache
 
 
-def setup() -> None:
-    setup_logger(term_logger, game_logger, level=Level.DEBUG,
+# Ticks between the actions of --autoplay, slow enough to watch.
+AUTOPLAY_INTERVAL = 4
+
+
+def setup(level: Level=Level.INFO) -> None:
+    setup_logger(term_logger, game_logger, level=level,
                  file='tetris.log', color=True,
-                 formatter=PLANE_FORMATTER)
+                 formatter=PLANE_FORMATTER, queued=True)
+
+
+def parse_args(argv: List[str]=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='tetris')
+    parser.add_argument('--headless', action='store_true',
+                        help='Run the game without a terminal.')
+    parser.add_argument('--capture', metavar='FILE', type=pathlib.Path,
+                        help='Write the frames of a headless game to FILE.')
+    parser.add_argument('--seed', type=int,
+                        help='Seed of the piece generator.')
+    parser.add_argument('--randomizer', default=Randomizer.Uniform.value,
+                        choices=[r.value for r in Randomizer],
+                        help='Piece randomizer.')
+    parser.add_argument('--profile', metavar='FILE', type=pathlib.Path,
+                        help='Time the phases of every frame and write the '
+                             'histograms to FILE as JSON.')
+    parser.add_argument('--overlay', action='store_true',
+                        help='Show the frame timings on screen.')
+    parser.add_argument('--record', metavar='FILE', type=pathlib.Path,
+                        help='Record the key events of the game to FILE. '
+                             'Not available with --autoplay.')
+    parser.add_argument('--replay', metavar='FILE', type=pathlib.Path,
+                        nargs='+',
+                        help='Replay recorded games headless, as fast as '
+                             'possible.')
+    parser.add_argument('--autoplay', metavar='TICKS', type=int, nargs='?',
+                        const=AUTOPLAY_INTERVAL,
+                        help='Let the game play itself, one action every '
+                             f'TICKS ticks ({AUTOPLAY_INTERVAL} by default), '
+                             'or one piece per tick with 0.')
+    parser.add_argument('--lookahead', metavar='DEPTH', type=int, default=0,
+                        help='Make --autoplay look DEPTH pieces ahead, '
+                             'searching on every CPU.')
+    parser.add_argument('--map', metavar='FILE', type=pathlib.Path,
+                        help='Play on a compiled map.')
+    parser.add_argument('--sparse', action='store_true',
+                        help='Store the field in chunks allocated on '
+                             'demand, for very large maps.')
+    parser.add_argument('--log-level', default=Level.INFO.name.lower(),
+                        choices=[level.name.lower() for level in Level],
+                        help='Level of the messages written to tetris.log.')
+    commands = parser.add_subparsers(dest='command')
+    sim_parser = commands.add_parser(
+        'sim', help='Play headless games in parallel and report stats.')
+    sim_parser.add_argument('-n', '--games', type=int, default=100,
+                            help='Number of games.')
+    sim_parser.add_argument('-j', '--workers', type=int,
+                            help='Number of worker processes. '
+                                 'Defaults to the number of CPUs.')
+    sim_parser.add_argument('--policy', default='random',
+                            choices=sorted(sim.POLICIES),
+                            help='Input policy.')
+    sim_parser.add_argument('--duration', type=float,
+                            help='Stop games after this many game seconds.')
+    map_parser = commands.add_parser(
+        'compile-map', help='Compile a text map for fast loading.')
+    map_parser.add_argument('map', type=pathlib.Path, help='Text map.')
+    map_parser.add_argument('-o', '--output', type=pathlib.Path,
+                            help='Output file. Defaults to the map with a '
+                                 f'{mapcache.SUFFIX} suffix.')
+    args = parser.parse_args(argv)
+    if args.autoplay is not None and args.autoplay < 0:
+        parser.error('--autoplay TICKS must not be negative')
+    if args.record and args.autoplay is not None:
+        # Only key events are recorded, not the moves of the autoplayer.
+        parser.error('--record cannot be used with --autoplay')
+    return args
+
+
+def make_terminal(args: argparse.Namespace) -> Terminal:
+    if args.headless:
+        backend = HeadlessBackend(capture=args.capture is not None)
+        return Terminal(debug=True, backend=backend)
+    return Terminal(debug=True)
+
+
+def write_frames(path: pathlib.Path, frames: List[List[str]]) -> None:
+    with path.open('w', encoding='utf-8') as f:
+        for frame in frames:
+            f.write('\n'.join(frame))
+            f.write('\n\f\n')
+
+
+def run_sim(args: argparse.Namespace) -> None:
+    stats = sim.run_batch(args.games, workers=args.workers,
+                          seed=args.seed or 0, policy=args.policy,
+                          duration=args.duration,
+                          randomizer=args.randomizer)
+    print(stats.summary())
+
+
+def run_compile_map(args: argparse.Namespace) -> None:
+    m = mapcache.parse(args.map.read_text(encoding='utf-8'))
+    output = args.output or args.map.with_suffix(mapcache.SUFFIX)
+    output.write_bytes(mapcache.dump(m))
+    print(f'{output}: {m.width}x{m.height}')
+
+
+def run_replay(args: argparse.Namespace) -> None:
+    pieces = lines = ticks = 0
+    frames: List[List[str]] = []
+    started = time.perf_counter()
+    for path in args.replay:
+        backend = HeadlessBackend(capture=args.capture is not None)
+        game = replay.replay(replay.load(path), Terminal(backend=backend),
+                             render=args.capture is not None)
+        pieces += game.placed
+        lines += game.lines
+        ticks += game.scheduler.tick
+        frames += backend.frames
+    wall_time = time.perf_counter() - started
+    if args.capture:
+        write_frames(args.capture, frames)
+    print(f'games:         {len(args.replay)}\n'
+          f'game time:     {ticks / FPS:.1f}s\n'
+          f'wall time:     {wall_time:.3f}s\n'
+          f'pieces:        {pieces}\n'
+          f'lines cleared: {lines}')
 
 
-def run():
+def run(argv: List[str]=None):
     rv = 1
 
     try:
-        setup()
-        with Game() as game:
-            game.run()
+        args = parse_args(argv)
+        if args.command == 'sim':
+            run_sim(args)
+            return
+        if args.command == 'compile-map':
+            run_compile_map(args)
+            return
+        if args.replay:
+            run_replay(args)
+            return
+        setup(Level[args.log_level.upper()])
+        profiler = None
+        if args.profile or args.overlay:
+            profiler = FrameProfiler(budget=1 / FPS)
+        with Game(make_terminal(args), seed=args.seed,
+                  randomizer=Randomizer(args.randomizer),
+                  profiler=profiler, overlay=args.overlay,
+                  field_cls=SparseField if args.sparse else Field,
+                  mapfile=args.map) as game:
+            backend = game.terminal.tb
+            if args.record:
+                game.recorder = replay.Recorder.open(args.record, game)
+            if args.autoplay is not None:
+                planner = None
+                if args.lookahead:
+                    # Decide within a frame.
+                    planner = Planner(depth=args.lookahead, budget=1 / FPS)
+                    planner.start()
+                game.autoplayer = Autoplayer(interval=args.autoplay,
+                                             planner=planner)
+            try:
+                game.run()
+            finally:
+                if game.recorder:
+                    game.recorder.close(game.scheduler.tick)
+                if game.autoplayer and game.autoplayer.planner:
+                    game.autoplayer.planner.close()
+        if args.headless and args.capture:
+            write_frames(args.capture, backend.frames)
+        if args.profile:
+            profiler.dump(args.profile)
 
     except Exit as e:
         rv = e.code
@@ -0,0 +1,283 @@
+import enum
+from typing import List, Sequence, Tuple  # noqa
+from .game import Map, TETRIMINOS, map_data
+from .generator import make_seed
+from .terminal import cell_positions
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:
+    np = None
+
+# Position of the first cell of a spawned piece, as in Game.spawn.
+SPAWN_X = 4
+SPAWN_Y = 0
+
+
+class Action(enum.IntEnum):
+    """
+    Actions of BatchEnv.step.
+    """
+    Noop = 0
+    Left = 1
+    Right = 2
+    Rotate = 3
+    Down = 4  # Fall one row right away.
+    Drop = 5  # Hard drop.
+
+
+class Observation(enum.IntEnum):
+    """
+    Values of the board cells returned by BatchEnv.observe.
+    """
+    Empty = 0
+    Block = 1
+    Piece = 2
+
+
+def piece_tables() -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """
+    Build the rotation, state count and kick tables of TETRIMINOS.
+
+    rotations[k, s] holds the four (dx, dy) offsets of piece k in rotation
+    state s relative to its first cell. Pieces with less than four states
+    repeat them. Kick lists are padded with their last kick.
+    """
+    rotations = np.array(
+        [[cls.rotations[s % cls.states] for s in range(4)]
+         for cls in TETRIMINOS], dtype=np.int32)
+    states = np.array([cls.states for cls in TETRIMINOS], dtype=np.int32)
+    longest = max(len(cls.kicks) for cls in TETRIMINOS)
+    kicks = np.array(
+        [cls.kicks + cls.kicks[-1:] * (longest - len(cls.kicks))
+         for cls in TETRIMINOS], dtype=np.int32)
+    return rotations, states, kicks
+
+
+def map_grid(s: str=map_data) -> 'np.ndarray':
+    """
+    Build the (height, width) block grid of a map layout.
+    """
+    m = Map()
+    m.load_from(s=s)
+    grid = np.zeros((m.height, m.width), dtype=bool)
+    for x, y in cell_positions(m.cells):
+        grid[y, x] = True
+    return grid
+
+
+class BatchEnv:
+    """
+    Batch of `size` Tetris boards stepped together with array operations.
+
+    The locked blocks of every board are kept in one (size, height, width)
+    boolean array and the falling pieces in per-board arrays of piece kind,
+    rotation state and position, so `step` costs a handful of NumPy calls
+    whatever the batch size. Pieces, kicks and the map layout are those of
+    the game. A board whose new piece cannot spawn is done and is reset
+    within the same step.
+    """
+    def __init__(self, size: int, seed: int=None, gravity: int=1,
+                 layout: str=map_data) -> None:
+        if np is None:
+            raise RuntimeError('BatchEnv requires numpy')
+        self.size = size
+        self.seed = make_seed() if seed is None else seed
+        self.gravity = gravity  # Steps per row of falling.
+        self.map = map_grid(layout)
+        self.height, self.width = self.map.shape
+        self.rotations, self.states, self.kicks = piece_tables()
+        # Spawn offset of the first cell of each piece.
+        self.first = np.array([cls.shape[0] for cls in TETRIMINOS],
+                              dtype=np.int32)
+        self.rng = np.random.default_rng(self.seed)
+        self.all = np.arange(size)
+        self.stack = np.zeros((size, self.height, self.width), dtype=bool)
+        self.kind = np.zeros(size, dtype=np.int32)
+        self.next = np.zeros(size, dtype=np.int32)
+        self.rotation = np.zeros(size, dtype=np.int32)
+        self.x = np.zeros(size, dtype=np.int32)
+        self.y = np.zeros(size, dtype=np.int32)
+        self.steps = np.zeros(size, dtype=np.int64)
+        self.pieces = np.zeros(size, dtype=np.int64)
+        self.lines = np.zeros(size, dtype=np.int64)
+        self.reset()
+
+    def reset(self) -> 'np.ndarray':
+        """
+        Reset every board and return the observation.
+        """
+        self._reset(self.all)
+        return self.observe()
+
+    def step(self, actions: Sequence[int]) -> Tuple['np.ndarray', 'np.ndarray',
+                                                    'np.ndarray']:
+        """
+        Apply one action per board, then gravity. Return the observation,
+        the number of lines each board cleared and whether it was done.
+        """
+        actions = np.asarray(actions)
+        self.steps += 1
+
+        dx = (actions == Action.Right).astype(np.int32) \
+            - (actions == Action.Left)
+        idx = np.flatnonzero(dx)
+        if len(idx):
+            self._shift(idx, dx[idx], 0)
+
+        idx = np.flatnonzero(actions == Action.Rotate)
+        if len(idx):
+            self._rotate(idx)
+
+        locked = np.zeros(self.size, dtype=bool)
+        idx = np.flatnonzero(actions == Action.Drop)
+        if len(idx):
+            self.y[idx] += self._drop_distance(idx)
+            locked[idx] = True
+
+        falling = ~locked & ((actions == Action.Down)
+                             | (self.steps % self.gravity == 0))
+        idx = np.flatnonzero(falling)
+        if len(idx):
+            moved = self._shift(idx, 0, 1)
+            locked[idx[~moved]] = True
+
+        rewards = np.zeros(self.size, dtype=np.int32)
+        dones = np.zeros(self.size, dtype=bool)
+        idx = np.flatnonzero(locked)
+        if len(idx):
+            self._lock(idx)
+            rewards[idx] = self._clear_lines(idx)
+            self._spawn(idx)
+            over = idx[self._blocked(idx, *self._cells(idx)).any(axis=1)]
+            dones[over] = True
+            self._reset(over)
+        return self.observe(), rewards, dones
+
+    def observe(self) -> 'np.ndarray':
+        """
+        Get the boards as a (size, height, width) array of Observation.
+        """
+        obs = (self.stack | self.map).astype(np.int8)
+        xs, ys = self._cells(self.all)
+        visible = ys >= 0
+        boards = np.broadcast_to(self.all[:, None], xs.shape)
+        obs[boards[visible], ys[visible], xs[visible]] = Observation.Piece
+        return obs
+
+    def _cells(self, idx: 'np.ndarray', dx: int=0, dy: int=0,
+               rotation: 'np.ndarray'=None) -> Tuple['np.ndarray',
+                                                     'np.ndarray']:
+        """
+        Get the (len(idx), 4) cell coordinates of the pieces of `idx`.
+        """
+        if rotation is None:
+            rotation = self.rotation[idx]
+        offsets = self.rotations[self.kind[idx], rotation]
+        xs = (self.x[idx] + dx)[:, None] + offsets[:, :, 0]
+        ys = (self.y[idx] + dy)[:, None] + offsets[:, :, 1]
+        return xs, ys
+
+    def _blocked(self, idx: 'np.ndarray', xs: 'np.ndarray',
+                 ys: 'np.ndarray') -> 'np.ndarray':
+        """
+        Tell which cells are blocked. Like Field.obstacle, cells outside
+        the board are blocked except above it.
+        """
+        height, width = self.height, self.width
+        outside = (xs < 0) | (xs >= width) | (ys >= height)
+        cx = np.clip(xs, 0, width - 1)
+        cy = np.clip(ys, 0, height - 1)
+        hit = self.stack[idx[:, None], cy, cx] | self.map[cy, cx]
+        return outside | (hit & (ys >= 0))
+
+    def _shift(self, idx: 'np.ndarray', dx, dy) -> 'np.ndarray':
+        """
+        Move the pieces of `idx` where they fit. Return which moved.
+        """
+        xs, ys = self._cells(idx, dx, dy)
+        moved = ~self._blocked(idx, xs, ys).any(axis=1)
+        ok = idx[moved]
+        self.x[ok] += dx if np.isscalar(dx) else dx[moved]
+        self.y[ok] += dy
+        return moved
+
+    def _rotate(self, idx: 'np.ndarray') -> None:
+        kind = self.kind[idx]
+        rotation = (self.rotation[idx] + 1) % self.states[kind]
+        pending = np.ones(len(idx), dtype=bool)
+        for n in range(self.kicks.shape[1]):
+            kx = self.kicks[kind, n, 0]
+            ky = self.kicks[kind, n, 1]
+            xs, ys = self._cells(idx, kx, ky, rotation)
+            fits = pending & ~self._blocked(idx, xs, ys).any(axis=1)
+            ok = idx[fits]
+            self.x[ok] += kx[fits]
+            self.y[ok] += ky[fits]
+            self.rotation[ok] = rotation[fits]
+            pending &= ~fits
+            if not pending.any():
+                break
+
+    def _drop_distance(self, idx: 'np.ndarray') -> 'np.ndarray':
+        """
+        Get how far the pieces of `idx` can fall.
+        """
+        height, width = self.height, self.width
+        occupied = self.stack[idx] | self.map
+        # Row of the first block at or below each row, per column.
+        rows = np.where(occupied, np.arange(height)[:, None], height)
+        below = np.minimum.accumulate(rows[:, ::-1], axis=1)[:, ::-1]
+        below = np.concatenate(
+            [below, np.full((len(idx), 1, width), height)], axis=1)
+        xs, ys = self._cells(idx)
+        start = np.clip(ys + 1, 0, height)
+        surface = below[np.arange(len(idx))[:, None], start,
+                        np.clip(xs, 0, width - 1)]
+        return (surface - ys - 1).min(axis=1)
+
+    def _lock(self, idx: 'np.ndarray') -> None:
+        xs, ys = self._cells(idx)
+        visible = ys >= 0
+        boards = np.broadcast_to(idx[:, None], xs.shape)
+        self.stack[boards[visible], ys[visible], xs[visible]] = True
+        self.pieces[idx] += 1
+
+    def _clear_lines(self, idx: 'np.ndarray') -> 'np.ndarray':
+        """
+        Remove the filled lines of `idx` and shift the blocks above them
+        down. Return the number of removed lines per board.
+        """
+        stack = self.stack[idx]
+        full = (stack | self.map).all(axis=2) & stack.any(axis=2)
+        lines = full.sum(axis=1)
+        cleared = lines > 0
+        if cleared.any():
+            stack, full = stack[cleared], full[cleared]
+            # Filled rows move to the top, in a stable order, and are
+            # emptied.
+            order = np.argsort(~full, axis=1, kind='stable')
+            stack = np.take_along_axis(stack, order[:, :, None], axis=1)
+            top = np.arange(self.height) < lines[cleared][:, None]
+            stack[top] = False
+            self.stack[idx[cleared]] = stack
+            self.lines[idx] += lines
+        return lines
+
+    def _spawn(self, idx: 'np.ndarray') -> None:
+        self.kind[idx] = self.next[idx]
+        self.next[idx] = self.rng.integers(len(TETRIMINOS), size=len(idx))
+        first = self.first[self.kind[idx]]
+        self.x[idx] = SPAWN_X + first[:, 0]
+        self.y[idx] = SPAWN_Y + first[:, 1]
+        self.rotation[idx] = 0
+
+    def _reset(self, idx: 'np.ndarray') -> None:
+        if not len(idx):
+            return
+        self.stack[idx] = False
+        self.steps[idx] = 0
+        self.pieces[idx] = 0
+        self.lines[idx] = 0
+        self.next[idx] = self.rng.integers(len(TETRIMINOS), size=len(idx))
+        self._spawn(idx)
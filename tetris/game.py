@@ -1,19 +1,34 @@
 import abc
-import datetime
+import functools
 import time
 import traceback
 import pathlib
-import random
-from typing import List, Set, Dict, Any, Callable, \
+from typing import List, Set, Dict, Tuple, Any, Callable, Type, \
     Generator  # noqa
-from .terminal import Terminal, Renderable, Cell, Color, \
-    Shape, Vector2, MouseKey, rotate_cells, scale_cells
-from .logging import create_logger
+from .terminal import Terminal, Renderable, Cell, CellBuffer, Cells, \
+    Color, Shape, Vector2, MouseKey, rotate_cells, scale_cells, \
+    cell_positions, SCALEX
+from .logging import create_logger, Level
 from .exceptions import StatusCode, Exit
+from .scheduler import Scheduler
+from .generator import PieceGenerator, Randomizer
+from .instrument import NullProfiler, Overlay, Phase
+from . import mapcache
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:
+    np = None
 
 
 FPS = 40  # Game FPS (Frame Per Second)
 
+GRAVITY_INTERVAL = FPS  # Frames between gravity steps
+
+LOCK_DELAY = FPS // 2  # Frames a landed piece can still be moved
+
+SPAWN = (4, 0)  # Position new pieces are put at
+
 DEFAULT_COLOR = Color.White
 
 basedir = pathlib.Path(__file__).parent
@@ -48,8 +63,8 @@ map_data = """
 """
 
 
-def now() -> datetime.datetime:
-    return datetime.datetime.now()
+def now() -> float:
+    return time.monotonic()
 
 
 class GameObject(Renderable):
@@ -62,7 +77,7 @@ class GameObject(Renderable):
         self.parent: Any = None
         self.children: List['GameObject'] = None
         self.set_color(fg=DEFAULT_COLOR, bg=DEFAULT_COLOR)
-        self.cells: List[Cell] = []
+        self.cells: Cells = []
 
     def update(self) -> None:
         pass
@@ -112,6 +127,27 @@ class Collision:
         self.dy = dy
 
 
+MASK64 = (1 << 64) - 1
+
+
+def splitmix64(x: int) -> int:
+    """
+    SplitMix64 mix of `x`, a 64-bit integer.
+    """
+    x = (x + 0x9e3779b97f4a7c15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & MASK64
+    return x ^ (x >> 31)
+
+
+@functools.lru_cache(maxsize=None)
+def zobrist_keys(n: int) -> Tuple[int, ...]:
+    """
+    Get the random 64-bit keys of `n` cells, the same in every process.
+    """
+    return tuple(splitmix64(i) for i in range(n))
+
+
 class FieldInfo:
     def __init__(self, x: int, y: int,
                  obj: GameObject=None, cell: Cell=None) -> None:
@@ -123,73 +159,355 @@ class FieldInfo:
 
 
 class Field:
+    """
+    Game field backed by a bitboard.
+
+    Occupancy is stored as one integer bitmask per row (bit ``x`` of
+    ``rows[y]``) and per column (bit ``y`` of ``columns[x]``), plus a flat
+    owner table mapping each occupied cell to the game object and cell
+    living there. Objects living in the field are kept in a registry along
+    with the number of cells they own.
+
+    ``hash`` is the Zobrist hash of the occupancy, the xor of the keys of
+    the occupied cells, kept up to date as cells are set and cleared.
+
+    Subclasses with another storage override `allocate` and the methods
+    touching the storage, see tetris.sparse.SparseField.
+    """
     def __init__(self, width: int, height: int) -> None:
-        logger.debug(f'Constructing Field w={width} h={height}')
+        logger.debug('Constructing %s w=%d h=%d', type(self).__name__,
+                     width, height)
         self.width = width
         self.height = height
         self.map: 'Map' = None
-        self.data: List[List[FieldInfo]] = [[
-            None for w in range(0, width)]
-            for h in range(0, height)]
+        self.objects: Dict[int, GameObject] = {}
+        self.counts: Dict[int, int] = {}
+        self.hash = 0
+        # Clear lines with NumPy. Opt-in, as building its arrays on every
+        # clear makes it slower than the bitmasks on the boards measured,
+        # from 12x22 up to 12x400.
+        self.use_numpy = False
+        self._map_grid: Any = None
+        self.allocate()
+
+    def allocate(self) -> None:
+        width, height = self.width, self.height
+        self.rows: List[int] = [0] * height
+        self.map_rows: List[int] = [0] * height
+        self.columns: List[int] = [0] * width
+        self.owners: List[GameObject] = [None] * (width * height)
+        self.cells: List[Cell] = [None] * (width * height)
+        self.keys = zobrist_keys(width * height)
+
+    def row(self, y: int) -> int:
+        """
+        Get the occupancy of row `y`, bit x for column x.
+        """
+        return self.rows[y]
+
+    def map_row(self, y: int) -> int:
+        """
+        Get the cells of row `y` which belong to the map.
+        """
+        return self.map_rows[y]
+
+    def column(self, x: int) -> int:
+        """
+        Get the occupancy of column `x`, bit y for row y.
+        """
+        return self.columns[x]
+
+    def key(self, x: int, y: int) -> int:
+        """
+        Get the Zobrist key of (x, y).
+        """
+        return self.keys[y * self.width + x]
+
+    def mark_map(self, x: int, y: int) -> None:
+        """
+        Count (x, y) as a map cell, whatever occupies it.
+        """
+        self.map_rows[y] |= 1 << x
+
+    def owner(self, x: int, y: int) -> GameObject:
+        """
+        Get the object at (x, y), or None. Unlike get, nothing is allocated
+        and out of range positions are empty.
+        """
+        if not self.contains(x, y):
+            return None
+        return self.owners[y * self.width + x]
 
     @property
-    def children(self) -> Generator:
-        checked: Set[int] = set()
-        for y in range(self.map.height):
-            for x in range(self.map.width):
-                finfo = self.data[y][x]
-                if finfo is None:
-                    continue
-                if id(finfo.obj) in checked:
-                    continue
-                checked.add(id(finfo.obj))
-                yield finfo.obj
+    def children(self) -> List[GameObject]:
+        return list(self.objects.values())
+
+    def acquire(self, obj: GameObject) -> None:
+        oid = id(obj)
+        count = self.counts.get(oid)
+        if count is None:
+            self.objects[oid] = obj
+            self.counts[oid] = 1
+        else:
+            self.counts[oid] = count + 1
+
+    def release(self, obj: GameObject) -> None:
+        oid = id(obj)
+        count = self.counts[oid] - 1
+        if count:
+            self.counts[oid] = count
+        else:
+            del self.objects[oid]
+            del self.counts[oid]
 
     def set_map(self, map: 'Map') -> None:
         self.map = map
+        self._map_grid = None
         self.update(map)
 
+    def contains(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def occupied(self, x: int, y: int) -> bool:
+        """
+        True if the cell at (x, y) is occupied, False otherwise.
+        """
+        if not self.contains(x, y):
+            return False
+        return bool(self.rows[y] >> x & 1)
+
+    def obstacle(self, obj: GameObject, x: int, y: int) -> GameObject:
+        """
+        Return the object which prevents `obj` from occupying (x, y), or
+        None if the cell is free. Cells outside the field belong to the map,
+        except the ones above the top row where new pieces spawn.
+        """
+        if not 0 <= x < self.width or y >= self.height:
+            return self.map
+        if y < 0 or not self.rows[y] >> x & 1:
+            return None
+        other = self.owners[y * self.width + x]
+        if other is obj or not other.collidable:
+            return None
+        return other
+
+    def collision(self, obj: GameObject,
+                  dx: int=0, dy: int=0) -> GameObject:
+        """
+        Return the first object `obj` would collide with when moved by
+        (dx, dy), or None if the move is possible.
+        """
+        for x, y in cell_positions(obj.make_cells()):
+            other = self.obstacle(obj, x + dx, y + dy)
+            if other is not None:
+                return other
+        return None
+
+    def surface(self, obj: GameObject, x: int, y: int) -> int:
+        """
+        Return the row of the first obstacle of `obj` below (x, y), or the
+        field height if there is none.
+        """
+        if not 0 <= x < self.width:
+            return y
+        start = max(y + 1, 0)
+        column = self.columns[x] >> start
+        while column:
+            low = column & -column
+            row = start + low.bit_length() - 1
+            if self.obstacle(obj, x, row) is not None:
+                return row
+            column ^= low
+        return self.height
+
+    def drop_distance(self, obj: GameObject) -> int:
+        """
+        Return how many rows `obj` can fall before it collides.
+        """
+        distance = self.height
+        for x, y in cell_positions(obj.make_cells()):
+            distance = min(distance, self.surface(obj, x, y) - y - 1)
+        return max(distance, 0)
+
     def update(self, obj: GameObject) -> None:
         self.clear(obj)
-        for cell in obj.make_cells():
-            x = cell.x
-            y = cell.y
-            self.data[y][x] = FieldInfo(x, y, obj, cell)
+        cells = obj.make_cells()
+        if isinstance(cells, CellBuffer):
+            for x, y in zip(cells.x, cells.y):
+                self.set_at(x, y, obj)
+        else:
+            for cell in cells:
+                self.set_at(cell.x, cell.y, obj, cell)
+
+    def set_at(self, x: int, y: int, obj: GameObject,
+               cell: Cell=None) -> None:
+        """
+        Put `obj` at (x, y). `cell` is None for objects storing their cells
+        in a CellBuffer.
+        """
+        if not self.contains(x, y):
+            return
+        bit = 1 << x
+        n = y * self.width + x
+        if not self.rows[y] & bit:
+            self.hash ^= self.keys[n]
+        self.rows[y] |= bit
+        self.columns[x] |= 1 << y
+        if obj is self.map:
+            self.map_rows[y] |= bit
+        prev = self.owners[n]
+        if prev is not obj:
+            if prev is not None:
+                self.release(prev)
+            self.acquire(obj)
+        self.owners[n] = obj
+        self.cells[n] = cell
 
     def get(self, x: int, y: int) -> FieldInfo:
-        try:
-            return self.data[y][x]
-        except IndexError:
+        if not self.contains(x, y):
             logger.warn(f'Out of range access ({x},{y})')
             return None
+        if not self.rows[y] >> x & 1:
+            return None
+        n = y * self.width + x
+        return FieldInfo(x, y, self.owners[n], self.cells[n])
 
     def clear(self, obj: GameObject) -> None:
         if not obj:
             return
-        for cell in obj.make_cells():
-            self.data[cell.y][cell.x] = None
+        width = self.width
+        for x, y in cell_positions(obj.make_cells()):
+            if self.contains(x, y) and self.owners[y * width + x] is obj:
+                self.clear_at(x, y)
+
+    def clear_at(self, x: int, y: int) -> None:
+        if not self.contains(x, y):
+            return
+        n = y * self.width + x
+        obj = self.owners[n]
+        if obj is None:
+            return
+        self.hash ^= self.keys[n]
+        mask = ~(1 << x)
+        self.rows[y] &= mask
+        self.map_rows[y] &= mask
+        self.columns[x] &= ~(1 << y)
+        self.owners[n] = None
+        self.cells[n] = None
+        self.release(obj)
 
     def remove(self, obj: GameObject) -> None:
         if not obj:
             return
-        for cell in obj.make_cells():
-            self.remove_at(cell.x, cell.y)
+        for x, y in list(cell_positions(obj.make_cells())):
+            self.remove_at(x, y)
 
     def remove_at(self, x: int, y: int) -> None:
         finfo = self.get(x, y)
         if not finfo:
             return
-        self.data[y][x] = None
+        self.clear_at(x, y)
 
         obj = finfo.obj
-        for n, c in enumerate(obj.make_cells()):
-            if c.x == x and c.y == y and not isinstance(obj, Map):
-                obj.remove(c)
+        if finfo.cell is not None and not isinstance(obj, Map):
+            obj.remove(finfo.cell)
 
     def remove_line(self, y: int) -> None:
-        line = self.data[y]
-        for x, c in enumerate(line):
-            self.remove_at(x, y)
+        line = self.rows[y]
+        x = 0
+        while line:
+            if line & 1:
+                self.remove_at(x, y)
+            line >>= 1
+            x += 1
+
+    def clear_lines(self) -> int:
+        """
+        Remove the filled lines and shift the blocks above them down.
+        Return the number of removed lines.
+        """
+        objs = [o for o in self.children
+                if isinstance(o, Tetrimino) and o.collidable and o.cells]
+        if not objs:
+            return 0
+        if self.use_numpy and np is not None:
+            return self._clear_lines_numpy(objs)
+        return self._clear_lines_python(objs)
+
+    def _clear_lines_python(self, objs: List['Tetrimino']) -> int:
+        height = self.map.height
+        width = self.map.width
+        full = [self.check_filled(y=y) for y in range(height)]
+        lines = sum(full)
+        if not lines:
+            return 0
+        # Number of removed lines below each row.
+        shifts = [0] * height
+        shift = 0
+        for y in range(height - 1, -1, -1):
+            shifts[y] = shift
+            shift += full[y]
+        for obj in objs:
+            self.clear(obj)
+        for obj in objs:
+            cells = []
+            for cell in obj.cells:
+                y = min(max(cell.y, 0), height - 1)
+                if full[y] and cell.y == y and 0 <= cell.x < width:
+                    continue
+                cell.y += shifts[y]
+                cells.append(cell)
+            obj.cells = cells
+        for obj in objs:
+            self.update(obj)
+        return lines
+
+    def _clear_lines_numpy(self, objs: List['Tetrimino']) -> int:
+        height = self.map.height
+        width = self.map.width
+        if self._map_grid is None:
+            self._map_grid = np.zeros((height, width), dtype=bool)
+            for x, y in cell_positions(self.map.make_cells()):
+                self._map_grid[y, x] = True
+        cells = [c for obj in objs for c in obj.cells]
+        xs = np.fromiter((c.x for c in cells), np.intp, len(cells))
+        ys = np.fromiter((c.y for c in cells), np.intp, len(cells))
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        # Like check_filled, only the cells the pieces still own count.
+        owner = self.owner
+        solid = np.fromiter((owner(c.x, c.y) is obj
+                             for obj in objs for c in obj.cells),
+                            bool, len(cells))
+
+        grid = self._map_grid.copy()
+        grid[ys[solid], xs[solid]] = True
+        blocks = np.zeros(height, dtype=bool)
+        blocks[ys[solid]] = True
+        full = grid.all(axis=1) & blocks
+        lines = int(full.sum())
+        if not lines:
+            return 0
+
+        # Number of removed lines below each row.
+        shifts = np.cumsum(full[::-1])[::-1] - full
+        rows = np.clip(ys, 0, height - 1)
+        keep = (~(full[rows] & inside)).tolist()
+        new_ys = (ys + shifts[rows]).tolist()
+
+        for obj in objs:
+            self.clear(obj)
+        n = 0
+        for obj in objs:
+            kept = []
+            for cell in obj.cells:
+                if keep[n]:
+                    cell.y = new_ys[n]
+                    kept.append(cell)
+                n += 1
+            obj.cells = kept
+        for obj in objs:
+            self.update(obj)
+        return lines
 
     def restructure(self) -> None:
         for obj in self.children:
@@ -199,32 +517,43 @@ class Field:
                     self.update(new_tetrimino)
 
     def check_filled(self, y: int=None, x: int=None) -> bool:
-        line = self.data[y]
+        line = self.rows[y]
         if x is not None:
-            return line[x] is None
-        filled = True
-        has_at_least_non_map = False
-        for c in line[:self.map.width]:
-            if c is None:
+            return not line >> x & 1
+        full = (1 << self.map.width) - 1
+        if line & full != full:
+            return False
+        # At least one block which does not belong to the map.
+        blocks = line & ~self.map_rows[y] & full
+        return bool(blocks) and self.collidable_blocks(y, blocks)
+
+    def collidable_blocks(self, y: int, blocks: int, x: int=0) -> bool:
+        """
+        True if the cells of row `y` set in `blocks`, bit i for column
+        x + i, all belong to collidable objects. Non-collidable objects,
+        like the next piece, do not fill lines.
+        """
+        while blocks:
+            low = blocks & -blocks
+            if not self.owner(x + low.bit_length() - 1, y).collidable:
                 return False
-            if isinstance(c.obj, Map):
-                continue
-            else:
-                has_at_least_non_map = True
-        return filled and has_at_least_non_map
+            blocks ^= low
+        return True
 
     def debug_print(self) -> None:
+        if not logger.isEnabledFor(Level.DEBUG):
+            return
         for y in range(self.height):
-            line = self.data[y]
+            line = self.rows[y]
+            map_line = self.map_rows[y]
             msg = ''
-            for c in line:
-                if c is None:
+            for x in range(self.width):
+                if not line >> x & 1:
                     msg += '□'
+                elif map_line >> x & 1:
+                    msg += '*'
                 else:
-                    if isinstance(c.obj, Map):
-                        msg += '*'
-                    else:
-                        msg += '■'
+                    msg += '■'
             logger.debug(msg)
         logger.debug('----------')
 
@@ -232,12 +561,22 @@ class Field:
 class Map(GameObject):
     """
     Map class.
+
+    Text maps are compiled to wall bitmasks once per process, and map
+    files once into tetris.mapcache.CACHE_DIR.
     """
+    static = True
+
     def __init__(self) -> None:
         super().__init__()
-        self.data: List[str] = []
+        self.gravity = False
+        # Walls of each row, bit x for column x. Shared with the cache.
+        self.rows: List[int] = []
+        # SHA-256 of the map text, see tetris.mapcache.
+        self.digest = b''
         self._width: int = 0
-        self._hight: int = 0
+        self._height: int = 0
+        self.cells: CellBuffer = CellBuffer()
 
     @property
     def width(self) -> int:
@@ -247,71 +586,147 @@ class Map(GameObject):
     def height(self) -> int:
         return self._height
 
-    def make_cells(self) -> List[Cell]:
+    def make_cells(self) -> CellBuffer:
         return self.cells
 
     def load(self, mapfile: pathlib.Path) -> None:
+        """
+        Load a text map, or a map compiled by tetris.mapcache.
+        """
+        if mapfile.suffix == mapcache.SUFFIX:
+            self.set_compiled(mapcache.load_file(mapfile))
+            return
         with mapfile.open() as f:
-            self.load_from(f)
-
-    def load_from(self, f=None, s: str=None) -> None:
-        logger.debug('Map load START')
-        if f:
-            for line in f:
-                if not line:
-                    continue
-                self.data.append(line.strip())
-        if s:
-            for line in s.splitlines():
-                if not line:
-                    continue
-                self.data.append(line.strip())
-        self._width = len(self.data[0])
-        self._height = len(self.data)
-        for y, line in enumerate(self.data):
-            logger.debug(line)
-            for x, c in enumerate(line):
-                if c == '*':
-                    cell = Cell(x=x, y=y, bg=Color.White, c=Shape.Square.value)
-                    self.cells.append(cell)
-        logger.debug('Map load END')
+            self.load_from(f, cache_dir=mapcache.CACHE_DIR)
+
+    def load_from(self, f=None, s: str=None,
+                  cache_dir: pathlib.Path=None) -> None:
+        text = (f.read() if f else '') + (s or '')
+        self.set_compiled(mapcache.cached(text, cache_dir))
+
+    def set_compiled(self, m: mapcache.CompiledMap) -> None:
+        self.rows = m.rows
+        self.digest = m.digest
+        self._width = m.width
+        self._height = m.height
+        cells = self.cells
+        cells.clear()
+        for y, row in enumerate(m.rows):
+            while row:
+                low = row & -row
+                cells.append(low.bit_length() - 1, y, bg=Color.White,
+                             c=Shape.Square.value)
+                row ^= low
+        logger.debug('Map loaded %dx%d', m.width, m.height)
 
 
 class Text(GameObject):
+    static = True
+
     def __init__(self, text: str='', *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        self.gravity = False
         self.set_color(fg=Color.White, bg=Color.Black)
         self.text = text
-        self.cells = [Cell(self.pos.x+n, self.pos.y,
-                           fg=self.fg, bg=self.bg, c=ord(c), scale=False)
-                      for n, c in enumerate(text)]
+        self.cells: CellBuffer = CellBuffer(scale=False)
+        for n, c in enumerate(text):
+            self.cells.append(self.pos.x+n, self.pos.y,
+                              fg=self.fg, bg=self.bg, c=ord(c))
 
-    def make_cells(self) -> List[Cell]:
+    def make_cells(self) -> CellBuffer:
         return self.cells
 
 
+Offsets = Tuple[Tuple[int, int], ...]
+
+
+def rotation_states(shape: Offsets, n: int=4) -> Tuple[Offsets, ...]:
+    """
+    Build the offset table of every rotation state of `shape`. Offsets are
+    relative to the first cell, which is the center of rotation.
+    """
+    px, py = shape[0]
+    state = tuple((x - px, y - py) for x, y in shape)
+    states = [state]
+    for _ in range(n - 1):
+        state = tuple((dy, -dx) for dx, dy in state)
+        states.append(state)
+    return tuple(states)
+
+
 class Tetrimino(GameObject):
     """
     Tetrimino - Blocks in Tetoris.
     """
     __metaclass__ = abc.ABCMeta
 
+    # Cell offsets from the spawn position. The first cell is the center
+    # of rotation.
+    shape: Offsets = ()
+
+    # Number of distinct rotation states.
+    states = 4
+
+    # Offset table of each rotation state, built from `shape`.
+    rotations: Tuple[Offsets, ...] = ()
+
+    # Alternative positions tried in order when a rotation collides.
+    kicks: Offsets = ((0, 0), (-1, 0), (1, 0), (0, -1))
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)  # type: ignore
+        if cls.shape:
+            cls.rotations = rotation_states(cls.shape, cls.states)
+
     def __init__(self, x: int, y: int, bg: Color=Color.Red) -> None:
         super().__init__()
         self.pos = Vector2(x, y)
         self.bg = bg
+        self.rotation = 0
+        fg, bg = self.get_color()
+        self.cells = [Cell(x+dx, y+dy, fg, bg) for dx, dy in self.shape]
 
     def on_collided(self, col: Collision) -> None:
         if col.dy is not None and col.dy > 0 and self is self.parent.player:
             self.parent.will_spawn = True
 
     def rotate(self) -> None:
-        self.cells = rotate_cells(self.cells)
-        for o in self.parent.field.children:
-            if check_collision(self, o):
-                self.cells = rotate_cells(self.cells, True)
+        if len(self.cells) != len(self.shape):
+            # Pieces broken by line clears no longer match their table.
+            self.rotate_free()
+            return
+        field = self.parent.field
+        state = (self.rotation + 1) % self.states
+        offsets = self.rotations[state]
+        pivot = self.cells[0]
+        for kx, ky in self.kicks:
+            x = pivot.x + kx
+            y = pivot.y + ky
+            for dx, dy in offsets:
+                if field.obstacle(self, x+dx, y+dy) is not None:
+                    break
+            else:
+                field.clear(self)
+                for n, cell in enumerate(self.cells):
+                    dx, dy = offsets[n]
+                    cell.x = x + dx
+                    cell.y = y + dy
+                field.update(self)
+                self.rotation = state
+                self.parent.dirty = True
                 return
 
+    def rotate_free(self) -> None:
+        if not self.cells:
+            return
+        field = self.parent.field
+        field.clear(self)
+        self.cells = rotate_cells(self.cells)
+        if field.collision(self) is not None:
+            self.cells = rotate_cells(self.cells, True)
+        field.update(self)
+        self.parent.dirty = True
+
     def make_cells(self) -> List[Cell]:
         return self.cells
 
@@ -340,6 +755,8 @@ class Tetrimino(GameObject):
                     isolated = False
             if isolated:
                 splitted = Tetrimino(cell.x, cell.y, cell.bg)
+                splitted.parent = self.parent
+                splitted.cells = [cell]
                 del self.cells[n]
                 return splitted
         return None
@@ -350,15 +767,11 @@ class ITetrimino(Tetrimino):
     I-Tetorimino. The shape is like this
     ■ ■ ■ ■
     """
+    shape = ((1, 0), (0, 0), (2, 0), (3, 0))
+    kicks = ((0, 0), (-1, 0), (1, 0), (-2, 0), (2, 0), (0, -1))
+
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y, Color.Cyan)
-        x = self.pos.x
-        y = self.pos.y
-        fg, bg = self.get_color()
-        self.cells = [Cell(x+1, y, fg, bg),
-                      Cell(x, y, fg, bg),
-                      Cell(x+2, y, fg, bg),
-                      Cell(x+3, y, fg, bg)]
 
 
 class OTetrimino(Tetrimino):
@@ -367,15 +780,11 @@ class OTetrimino(Tetrimino):
     ■ ■
     ■ ■
     """
+    shape = ((0, 0), (1, 0), (0, 1), (1, 1))
+    states = 1
+
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y, Color.Yellow)
-        x = self.pos.x
-        y = self.pos.y
-        fg, bg = self.get_color()
-        self.cells = [Cell(x, y, fg, bg),
-                      Cell(x+1, y, fg, bg),
-                      Cell(x, y+1, fg, bg),
-                      Cell(x+1, y+1, fg, bg)]
 
 
 class STetrimino(Tetrimino):
@@ -384,15 +793,10 @@ class STetrimino(Tetrimino):
       ■ ■
     ■ ■
     """
+    shape = ((1, 0), (0, 0), (1, 1), (2, 1))
+
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y, Color.Green)
-        x = self.pos.x
-        y = self.pos.y
-        fg, bg = self.get_color()
-        self.cells = [Cell(x+1, y, fg, bg),
-                      Cell(x, y, fg, bg),
-                      Cell(x+1, y+1, fg, bg),
-                      Cell(x+2, y+1, fg, bg)]
 
 
 class ZTetrimino(Tetrimino):
@@ -401,15 +805,10 @@ class ZTetrimino(Tetrimino):
     ■ ■
       ■ ■
     """
+    shape = ((1, -1), (0, 0), (1, 0), (2, -1))
+
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y, Color.Red)
-        x = self.pos.x
-        y = self.pos.y
-        fg, bg = self.get_color()
-        self.cells = [Cell(x+1, y-1, fg, bg),
-                      Cell(x, y, fg, bg),
-                      Cell(x+1, y, fg, bg),
-                      Cell(x+2, y-1, fg, bg)]
 
 
 class LTetrimino(Tetrimino):
@@ -418,15 +817,10 @@ class LTetrimino(Tetrimino):
         ■
     ■ ■ ■
     """
+    shape = ((2, 0), (0, 0), (1, 0), (2, 1))
+
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y, Color.Blue)
-        x = self.pos.x
-        y = self.pos.y
-        fg, bg = self.get_color()
-        self.cells = [Cell(x+2, y, fg, bg),
-                      Cell(x, y, fg, bg),
-                      Cell(x+1, y, fg, bg),
-                      Cell(x+2, y+1, fg, bg)]
 
 
 class JTetrimino(Tetrimino):
@@ -435,15 +829,10 @@ class JTetrimino(Tetrimino):
     ■
     ■ ■ ■
     """
+    shape = ((0, 0), (0, 1), (1, 0), (2, 0))
+
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y, Color.Blue)
-        x = self.pos.x
-        y = self.pos.y
-        fg, bg = self.get_color()
-        self.cells = [Cell(x, y, fg, bg),
-                      Cell(x, y+1, fg, bg),
-                      Cell(x+1, y, fg, bg),
-                      Cell(x+2, y, fg, bg)]
 
 
 class TTetrimino(Tetrimino):
@@ -452,34 +841,85 @@ class TTetrimino(Tetrimino):
       ■
     ■ ■ ■
     """
+    shape = ((1, 0), (0, 0), (1, 1), (2, 0))
+
     def __init__(self, x: int, y: int) -> None:
         super().__init__(x, y, Color.Magenta)
-        x = self.pos.x
-        y = self.pos.y
-        fg, bg = self.get_color()
-        self.cells = [Cell(x+1, y, fg, bg),
-                      Cell(x, y, fg, bg),
-                      Cell(x+1, y+1, fg, bg),
-                      Cell(x+2, y, fg, bg)]
+
+
+TETRIMINOS = [ITetrimino, OTetrimino, STetrimino, ZTetrimino,
+              TTetrimino, LTetrimino, JTetrimino]
+
+
+class Ghost(GameObject):
+    """
+    Ghost piece showing where the player is going to land.
+    """
+    def __init__(self, game: 'Game') -> None:
+        super().__init__()
+        self.parent = game
+        self.gravity = False
+        self.collidable = False
+        self.set_color(fg=Color.White, bg=Color.Default)
+
+    def make_cells(self) -> List[Cell]:
+        player = self.parent.player
+        if not player:
+            return []
+        pcells = player.make_cells()
+        if len(self.cells) != len(pcells):
+            self.cells = [Cell(fg=self.fg, bg=self.bg, c=Shape.Bullet.value)
+                          for _ in pcells]
+        distance = self.parent.field.drop_distance(player)
+        for cell, pcell in zip(self.cells, pcells):
+            cell.x = pcell.x
+            cell.y = pcell.y + distance
+            cell.fg = pcell.bg
+        return self.cells
 
 
 class Game:
     """
     Game main class.
     """
-    def __init__(self) -> None:
-        self.terminal: Terminal = Terminal(debug=True)
+    def __init__(self, terminal: Terminal=None,
+                 clock: Callable[[], float]=None, seed: int=None,
+                 randomizer: Randomizer=Randomizer.Uniform,
+                 profiler: NullProfiler=None, overlay: bool=False,
+                 field_cls: Type[Field]=Field,
+                 mapfile: pathlib.Path=None) -> None:
+        self.terminal: Terminal = terminal or Terminal(debug=True)
+        self.profiler = profiler or NullProfiler()
+        self.scheduler = Scheduler(FPS, clock or self.terminal.clock)
+        self.pieces = PieceGenerator(len(TETRIMINOS), seed, randomizer)
+        self.dirty = True
+        self.rendered: int = None
+        self.frames = 0  # Number of rendered frames
+        self.placed = 0  # Number of locked pieces
+        self.lines = 0  # Number of cleared lines
         self.objects: List[GameObject] = []
         self.map: Map = Map()
-        self.map.load_from(s=map_data)
-        self.field = Field(self.terminal.width, self.terminal.height)
+        if mapfile:
+            self.map.load(mapfile)
+        else:
+            self.map.load_from(s=map_data)
+        self.field = field_cls(max(self.terminal.width, self.map.width),
+                               max(self.terminal.height, self.map.height))
         self.field.set_map(self.map)
         self.next_player: GameObject = None
         self.player: GameObject = None
-        self.last_second: datetime.datetime = now()
         self.will_spawn = False
         self.add(self.map)
         self.message: Text = None
+        self.ghost = Ghost(self)
+        self.overlay: Overlay = None
+        # Receives every dispatched key event, see tetris.replay.Recorder.
+        self.recorder: Any = None
+        # Plays every spawned piece, see tetris.autoplay.Autoplayer.
+        self.autoplayer: Any = None
+        if overlay and self.profiler.enabled:
+            self.overlay = Overlay(self.profiler,
+                                   x=(self.map.width + 1) * SCALEX, y=0)
 
         def terminal_on_shutdown():
             raise Exit()
@@ -492,6 +932,7 @@ class Game:
         regist(MouseKey.Up, lambda k: self.move(self.player, dx=0, dy=-1))
         regist(MouseKey.Down, lambda k: self.move(self.player, dx=0, dy=3))
         regist(MouseKey.Enter, lambda k: self.player.rotate())
+        regist(MouseKey.Space, lambda k: self.hard_drop())
 
     def __enter__(self) -> 'Game':
         return self
@@ -499,19 +940,26 @@ class Game:
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
         self.terminal.close()
 
-    def run(self) -> int:
+    def run(self, duration: float=None) -> int:
         """
-        Run the Game loop.
+        Run the Game loop, for at most `duration` seconds if given.
         """
-        self.system_message('GAME START')
-        self.spawn()
+        self.start()
+        end = None if duration is None else int(duration * FPS)
+        profiler = self.profiler
         try:
-            while True:
-                self.update(now())
-                if self.will_spawn:
-                    self.check_tetris()
-                    self.spawn()
-                time.sleep(1 / FPS)
+            while end is None or self.scheduler.tick < end:
+                profiler.begin_frame()
+                # Sleep until a key is pressed or something is due.
+                timeout = self.scheduler.timeout(self.next_tick())
+                profiler.push(Phase.Input)
+                event = self.terminal.poll_key_event(timeout)
+                profiler.pop()
+                self.update(self.scheduler.clock())
+                if event:
+                    self.dispatch(*event)
+                self.render()
+                profiler.end_frame()
 
         except Exit as e:
             return StatusCode.Exit
@@ -521,46 +969,167 @@ class Game:
             logger.error(e)
             logger.error(traceback.format_exc())
             return StatusCode.Error
-        return 0
+        return StatusCode.OK
+
+    def start(self) -> None:
+        """
+        Spawn the first player and start the clock.
+        """
+        self.system_message('GAME START')
+        self.scheduler.reset()
+        self.spawn()
+        self.scheduler.schedule('gravity', GRAVITY_INTERVAL)
+
+    def next_tick(self) -> int:
+        """
+        Get the next tick the game loop has something to do.
+        """
+        tick = self.scheduler.next_tick()
+        if self.dirty:
+            # Render on the next tick at the latest.
+            render = self.scheduler.tick + 1
+            tick = render if tick is None else min(tick, render)
+        return tick
+
+    def advance(self, tick: int) -> None:
+        """
+        Run everything scheduled up to `tick`, in tick order.
+        """
+        while True:
+            event = self.scheduler.pop(tick)
+            if event is None:
+                break
+            t, name = event
+            if name == 'gravity':
+                self.scheduler.schedule('gravity', t + GRAVITY_INTERVAL)
+                self.profiler.push(Phase.Gravity)
+                self.gravity()
+                self.profiler.pop()
+            elif name == 'lock':
+                self.lock()
+            elif name == 'autoplay':
+                self.autoplayer.step(self)
+            self.settle(t)
+        self.scheduler.tick = max(self.scheduler.tick, tick)
+
+    def dispatch(self, key: int, uch: str=None) -> None:
+        """
+        Handle a key event on the current tick.
+        """
+        if self.recorder:
+            self.recorder.record(self.scheduler.tick, key, uch)
+        self.terminal.dispatch_key_event(key, uch)
+        self.settle(self.scheduler.tick)
+
+    def settle(self, tick: int) -> None:
+        """
+        Start the lock delay of a player which has just landed.
+        """
+        if self.will_spawn and not self.scheduler.scheduled('lock'):
+            self.scheduler.schedule('lock', tick + LOCK_DELAY)
+
+    def lock(self) -> None:
+        """
+        Lock the landed player and spawn the next one.
+        """
+        self.scheduler.cancel('lock')
+        player = self.player
+        if player and player.cells and self.field.drop_distance(player):
+            # Moved off the ledge during the lock delay.
+            self.will_spawn = False
+            return
+        self.placed += 1
+        self.check_tetris()
+        self.spawn()
+
+    def render(self) -> None:
+        """
+        Render the game if anything changed, at most once per tick.
+        """
+        if not self.dirty or self.rendered == self.scheduler.tick:
+            return
+        self.profiler.push(Phase.Render)
+        self.terminal.update(self.scheduler.clock(), self.ghost,
+                             *self.field.children, self.overlay)
+        self.profiler.pop()
+        self.rendered = self.scheduler.tick
+        self.dirty = False
+        self.frames += 1
 
     def spawn(self) -> None:
-        tetriminos = [ITetrimino, OTetrimino, STetrimino, ZTetrimino,
-                      TTetrimino, LTetrimino, JTetrimino]
-        cls = random.choice(tetriminos)
         self.add(self.player)
-        self.add_player(cls(x=4, y=0))
+        while True:
+            cls = TETRIMINOS[self.pieces.next()]
+            x, y = SPAWN
+            self.add_player(cls(x=x, y=y))
+            if self.player:
+                break
         self.will_spawn = False
-        if not self.player:
-            self.spawn()
+        self.scheduler.cancel('lock')
+        if self.autoplayer:
+            self.autoplayer.on_spawn(self)
 
     def move(self, obj: GameObject, dx: int, dy: int) -> None:
         def op(v: int) -> int:
             return 1 if v >= 0 else -1
+        profiler = self.profiler
+        profiler.push(Phase.Move)
         self.field.clear(obj)
-        steps: List[Dict] = []
-        for x in range(abs(dx)):
-            steps.append(dict(dx=1*op(dx)))
-        for y in range(abs(dy)):
-            steps.append(dict(dy=1*op(dy)))
-        for step in steps:
-            obj.move(**step)
-            for o in self.field.children:
-                if check_collision(obj, o):
+        steps: List[Tuple[Dict, int]] = [
+            (dict(dx=op(dx)), abs(dx)),
+            (dict(dy=op(dy)), abs(dy))]
+        if dy > 0 and obj.collidable:
+            # Falling is resolved in one shot from the column surfaces.
+            steps.pop()
+        for step, n in steps:
+            for _ in range(n):
+                o = None
+                if obj.collidable:
+                    profiler.push(Phase.Collision)
+                    o = self.field.collision(obj, **step)
+                    profiler.pop()
+                if o is not None:
                     collided(obj, o, **step)
                     collided(o, obj)
-                    obj.move(**{k: -v for k, v in step.items()})
+                    # Further steps in the same direction would hit the
+                    # same obstacle.
                     break
-        self.check_game_over()
+                obj.move(**step)
+        if dy > 0 and obj.collidable:
+            self.fall(obj, dy)
         self.field.update(obj)
-        self.terminal.update(now(), self.player, *list(self.field.children))
+        self.dirty = True
+        profiler.pop()
+
+    def fall(self, obj: GameObject, dy: int) -> None:
+        """
+        Move `obj` down by `dy` rows at most, colliding with the object
+        below if it lands on the way.
+        """
+        self.profiler.push(Phase.Collision)
+        distance = self.field.drop_distance(obj)
+        self.profiler.pop()
+        if distance:
+            obj.move(dy=min(dy, distance))
+        if distance < dy:
+            o = self.field.collision(obj, dy=1)
+            collided(obj, o, dy=1)
+            collided(o, obj)
+
+    def hard_drop(self) -> None:
+        """
+        Drop the player straight down and lock it.
+        """
+        self.move(self.player, dx=0, dy=self.field.height)
+        self.lock()
 
     def check_game_over(self) -> None:
-        cells = self.player.make_cells()
-        if cells:
-            origin = self.player.pos
-            current = Vector2(cells[0].x, cells[0].y)
-            if origin == current:
-                raise Exit()
+        """
+        End the game if the player is blocked where it spawns.
+        """
+        self.field.clear(self.player)
+        if self.field.collision(self.player) is not None:
+            raise Exit()
 
     def add(self, obj: GameObject) -> None:
         """
@@ -570,6 +1139,7 @@ class Game:
             return
         obj.parent = self
         self.field.update(obj)
+        self.dirty = True
 
     def remove(self, obj: GameObject) -> None:
         if not obj:
@@ -586,43 +1156,56 @@ class Game:
         if self.player:
             self.player.gravity = True
             self.player.collidable = True
+            self.check_game_over()
             self.move(self.player, dx=0, dy=1)
         self.next_player = obj
         self.next_player.gravity = False
         self.next_player.collidable = False
         self.add(self.next_player)
 
+    def preview(self, count: int) -> List[type]:
+        """
+        Get the classes of the `count` pieces coming after `next_player`.
+        """
+        return [TETRIMINOS[n] for n in self.pieces.preview(count)]
+
     def system_message(self, text: str) -> None:
         """
-        Write system message in terminal.
+        Write system message in terminal, below the map.
         """
         if self.message and text == self.message.text:
             return
         self.remove(self.message)
-        self.message = Text(x=0, y=22, text=text,
+        self.message = Text(x=0, y=self.map.height, text=text,
                             fg=Color.White,
                             bg=Color.Black)
         self.add(self.message)
 
-    def update(self, now: datetime.datetime) -> None:
+    def update(self, now: float) -> None:
         """
-        Update terminal and game objects.
+        Update game objects up to the clock time `now`.
         """
+        self.profiler.push(Phase.Update)
         for obj in self.field.children:
             obj.update()
-        # Gravity: move player 1 point per second.
-        if (now - self.last_second).seconds >= 1:
-            self.last_second = now
-            for obj in self.field.children:
-                if obj.gravity:
-                    self.move(obj, dx=0, dy=1)
-            self.field.debug_print()
-        self.terminal.update(now, *list(self.field.children))
+        self.profiler.pop()
+        self.advance(self.scheduler.tick_at(now))
+
+    def gravity(self) -> None:
+        """
+        Move every object under gravity 1 point down.
+        """
+        for obj in self.field.children:
+            if obj.gravity:
+                self.move(obj, dx=0, dy=1)
+        self.field.debug_print()
 
     def check_tetris(self) -> None:
-        for y in range(0, self.map.height):
-            if self.field.check_filled(y=y):
-                logger.debug(f'The line is ({y}) filled with blocks.'
-                             f' It is going to be deleted.')
-                self.field.remove_line(y)
+        self.profiler.push(Phase.LineClear)
+        lines = self.field.clear_lines()
+        self.lines += lines
+        if lines:
+            logger.debug('%d lines are filled with blocks.'
+                         ' They have been deleted.', lines)
         self.field.restructure()
+        self.profiler.pop()
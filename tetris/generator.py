@@ -0,0 +1,76 @@
+import array
+import enum
+import random
+from typing import List  # noqa
+
+
+class Randomizer(enum.Enum):
+    """
+    Piece randomizer algorithms.
+    """
+    Uniform = 'uniform'  # Every piece is drawn independently.
+    Bag = 'bag'  # Every run of n pieces is a shuffled set of all of them.
+
+
+def make_seed() -> int:
+    """
+    Make a fresh 32-bit seed.
+    """
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+class PieceGenerator:
+    """
+    Seeded generator of piece indices in [0, n).
+
+    Pieces are generated ahead in bulk into a compact array, which also
+    serves as the preview queue. A generator built with the same seed and
+    randomizer yields the same sequence in any process.
+    """
+    def __init__(self, n: int, seed: int=None,
+                 randomizer: Randomizer=Randomizer.Uniform,
+                 chunk: int=64) -> None:
+        self.n = n
+        self.seed = make_seed() if seed is None else seed
+        self.randomizer = Randomizer(randomizer)
+        self.rng = random.Random(self.seed)
+        self.chunk = chunk
+        self.queue = array.array('b')
+        self.head = 0
+        self.count = 0
+
+    def fill(self, count: int) -> None:
+        """
+        Generate at least `count` more pieces into the queue.
+        """
+        if self.head >= self.chunk:
+            del self.queue[:self.head]
+            self.head = 0
+        rng = self.rng
+        if self.randomizer is Randomizer.Bag:
+            bag = list(range(self.n))
+            for _ in range(-(-count // self.n)):
+                rng.shuffle(bag)
+                self.queue.extend(bag)
+        else:
+            n = self.n
+            self.queue.extend(int(rng.random() * n) for _ in range(count))
+
+    def preview(self, count: int) -> List[int]:
+        """
+        Get the next `count` pieces without taking them.
+        """
+        if len(self.queue) - self.head < count:
+            self.fill(max(count, self.chunk))
+        return self.queue[self.head:self.head + count].tolist()
+
+    def next(self) -> int:
+        """
+        Take the next piece.
+        """
+        if self.head >= len(self.queue):
+            self.fill(self.chunk)
+        piece = self.queue[self.head]
+        self.head += 1
+        self.count += 1
+        return piece
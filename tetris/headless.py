@@ -0,0 +1,136 @@
+import array
+import collections
+import math
+from typing import Any, Deque, Iterable, Iterator, List, Optional, \
+    Tuple  # noqa
+from .terminal import Backend, Color, MouseKey, DEFAULT_SQUARE
+
+# termbox event type of key events.
+EVENT_KEY = 1
+
+# Scripted input event: (time, key, uch). `key` is a MouseKey or its value.
+ScriptEvent = Tuple[float, Any, Optional[str]]
+
+
+class VirtualClock:
+    """
+    Clock which only moves when it is told to.
+    """
+    def __init__(self, t: float=0.0) -> None:
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+    def advance(self, dt: float) -> None:
+        self.t += dt
+
+    def advance_to(self, t: float) -> None:
+        self.t = max(self.t, t)
+
+
+class HeadlessBackend(Backend):
+    """
+    In-memory terminal backend.
+
+    Cells are drawn into a framebuffer instead of a tty. Input comes from
+    a script of (time, key, uch) events, ordered by time, and from `feed`.
+    Waiting for input advances the virtual clock instead of sleeping, so a
+    headless game runs as fast as the CPU allows. With `capture`, the text
+    of every presented frame is kept in `frames`.
+    """
+    def __init__(self, width: int=80, height: int=24,
+                 script: Iterable[ScriptEvent]=None,
+                 clock: VirtualClock=None, capture: bool=False) -> None:
+        self._width = width
+        self._height = height
+        self.clock = clock or VirtualClock()
+        self.chars = array.array('i', [DEFAULT_SQUARE] * (width * height))
+        self.fgs = array.array('h', [Color.Default] * (width * height))
+        self.bgs = array.array('h', [Color.Default] * (width * height))
+        self.capture = capture
+        self.frames: List[List[str]] = []
+        self.presented = 0
+        self.closed = False
+        self._queue: Deque[ScriptEvent] = collections.deque()
+        self._script: Iterator[ScriptEvent] = iter(script or [])
+        self._pending: Optional[ScriptEvent] = None
+
+    def width(self) -> int:
+        return self._width
+
+    def height(self) -> int:
+        return self._height
+
+    def change_cell(self, x: int, y: int, c: int, fg: int, bg: int) -> None:
+        if 0 <= x < self._width and 0 <= y < self._height:
+            n = y * self._width + x
+            self.chars[n] = c
+            self.fgs[n] = fg
+            self.bgs[n] = bg
+
+    def clear(self) -> None:
+        for n in range(len(self.chars)):
+            self.chars[n] = DEFAULT_SQUARE
+            self.fgs[n] = Color.Default
+            self.bgs[n] = Color.Default
+
+    def present(self) -> None:
+        self.presented += 1
+        if self.capture:
+            self.frames.append(self.screen())
+
+    def screen(self) -> List[str]:
+        """
+        Get the framebuffer as lines of text. Cells with a background color
+        and a blank character are shown as '#'.
+        """
+        lines = []
+        for y in range(self._height):
+            line = []
+            for n in range(y * self._width, (y + 1) * self._width):
+                c = self.chars[n]
+                if c == DEFAULT_SQUARE and self.bgs[n] != Color.Default:
+                    c = ord('#')
+                line.append(chr(c))
+            lines.append(''.join(line).rstrip())
+        return lines
+
+    def feed(self, key: MouseKey=None, uch: str=None) -> None:
+        """
+        Inject a key event, delivered before any scripted one.
+        """
+        self._queue.append((self.clock(), key, uch))
+
+    def peek_event(self, timeout: int=0) -> Optional[Tuple]:
+        return self._wait(self.clock() + timeout / 1000)
+
+    def poll_event(self) -> Optional[Tuple]:
+        return self._wait(math.inf)
+
+    def close(self) -> None:
+        self.closed = True
+
+    def _wait(self, deadline: float) -> Optional[Tuple]:
+        event = self._next_event(deadline)
+        if event is None:
+            if deadline != math.inf:
+                self.clock.advance_to(deadline)
+            return None
+        t, key, uch = event
+        self.clock.advance_to(t)
+        if isinstance(key, MouseKey):
+            key = key.value
+        if isinstance(key, str):
+            key, uch = None, key
+        return (EVENT_KEY, uch, 0 if key is None else key, 0, 0, 0, 0, 0)
+
+    def _next_event(self, deadline: float) -> Optional[ScriptEvent]:
+        if self._queue:
+            return self._queue.popleft()
+        if self._pending is None:
+            self._pending = next(self._script, None)
+        if self._pending is not None and self._pending[0] <= deadline:
+            event, self._pending = self._pending, None
+            return event
+        return None
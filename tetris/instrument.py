@@ -0,0 +1,199 @@
+import array
+import bisect
+import enum
+import json
+import pathlib
+import time
+from typing import Any, Dict, List, Tuple  # noqa
+from .terminal import Renderable, CellBuffer, Color
+
+# Upper bounds of the histogram buckets in seconds. The last bucket
+# counts everything slower.
+BUCKETS: Tuple[float, ...] = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+class Phase(enum.IntEnum):
+    """
+    Phases of a frame.
+    """
+    Input = 0  # Waiting for and reading a key event.
+    Update = 1  # GameObject.update of every object.
+    Gravity = 2
+    Move = 3
+    Collision = 4
+    LineClear = 5
+    Render = 6
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets.
+    """
+    def __init__(self, buckets: Tuple[float, ...]=BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = array.array('l', [0] * (len(buckets) + 1))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Get the upper bound of the bucket holding the `p`th percentile,
+        or the maximum if it is lower.
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for n, count in enumerate(self.counts[:-1]):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[n], self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'buckets': list(self.buckets),
+            'counts': self.counts.tolist(),
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+        }
+
+
+class NullProfiler:
+    """
+    Profiler which records nothing, used when profiling is off.
+    """
+    enabled = False
+
+    def begin_frame(self) -> None:
+        pass
+
+    def end_frame(self) -> None:
+        pass
+
+    def push(self, phase: Phase) -> None:
+        pass
+
+    def pop(self) -> None:
+        pass
+
+
+class FrameProfiler(NullProfiler):
+    """
+    Per-frame phase timer.
+
+    Phases are pushed and popped around the code they time and may nest.
+    A phase is only charged with its own time, not with the time of the
+    phases nested in it. At the end of a frame the time of every phase is
+    recorded in its histogram, and the time of the whole frame, without
+    waiting for input, in `frame`. Frames slower than `budget` count as
+    stutters, charged to the slowest phase in `culprits`.
+    """
+    enabled = True
+
+    def __init__(self, budget: float,
+                 clock=time.perf_counter) -> None:
+        self.budget = budget
+        self.clock = clock
+        self.phases = [Histogram() for _ in Phase]
+        self.frame = Histogram()
+        self.stutters = 0
+        self.culprits = [0] * len(Phase)
+        self.last = [0.0] * len(Phase)  # Phase times of the last frame
+        self._current = [0.0] * len(Phase)
+        self._stack: List[List] = []
+        self._started = 0.0
+
+    def begin_frame(self) -> None:
+        self._stack.clear()
+        self._current = [0.0] * len(Phase)
+        self._started = self.clock()
+
+    def end_frame(self) -> None:
+        current = self._current
+        busy = self.clock() - self._started - current[Phase.Input]
+        for phase, seconds in enumerate(current):
+            if seconds:
+                self.phases[phase].record(seconds)
+        self.frame.record(busy)
+        if busy > self.budget:
+            self.stutters += 1
+            work = current[Phase.Input + 1:]
+            self.culprits[work.index(max(work)) + 1] += 1
+        self.last = current
+
+    def push(self, phase: Phase) -> None:
+        self._stack.append([phase, self.clock(), 0.0])
+
+    def pop(self) -> None:
+        phase, started, nested = self._stack.pop()
+        elapsed = self.clock() - started
+        self._current[phase] += elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'budget': self.budget,
+            'stutters': self.stutters,
+            'culprits': {p.name: self.culprits[p] for p in Phase},
+            'frame': self.frame.to_dict(),
+            'phases': {p.name: self.phases[p].to_dict() for p in Phase},
+        }
+
+    def dump(self, path: pathlib.Path) -> None:
+        """
+        Write the histograms to `path` as JSON.
+        """
+        with path.open('w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write('\n')
+
+    def summary(self) -> List[str]:
+        """
+        Get a line per phase with the last, p99 and max times in ms.
+        """
+        lines = [f'{"phase":<9} last   p99   max']
+        rows = [(p.name, self.last[p], self.phases[p]) for p in Phase]
+        rows.append(('Frame', sum(self.last) - self.last[Phase.Input],
+                     self.frame))
+        for name, last, hist in rows:
+            lines.append(f'{name:<9}{last * 1000:5.1f} '
+                         f'{hist.percentile(99) * 1000:5.1f} '
+                         f'{hist.max * 1000:5.1f}')
+        lines.append(f'stutters {self.stutters}')
+        return lines
+
+
+class Overlay(Renderable):
+    """
+    On-screen summary of a FrameProfiler.
+    """
+    def __init__(self, profiler: FrameProfiler, x: int, y: int) -> None:
+        super().__init__(x, y, fg=Color.White, bg=Color.Black)
+        self.profiler = profiler
+        self.cells = CellBuffer(scale=False)
+
+    def make_cells(self) -> CellBuffer:
+        cells = self.cells
+        cells.clear()
+        x, y = self.pos.x, self.pos.y
+        for n, line in enumerate(self.profiler.summary()):
+            for m, c in enumerate(line):
+                cells.append(x + m, y + n, self.fg, self.bg, ord(c))
+        return cells
@@ -1,20 +1,52 @@
+import atexit
 import enum
 import logging
 import logging.handlers
 import pathlib
+import queue
 import sys
-import traceback
 from typing import Union, List, Tuple  # noqa
 from termcolor import colored  # type: ignore
 
 
+def stack_depth() -> int:
+    """
+    Get the number of frames on the stack below the logging call.
+    """
+    f = sys._getframe(1)
+    while f is not None and f.f_code.co_filename in _logging_files:
+        f = f.f_back
+    depth = 0
+    while f is not None:
+        depth += 1
+        f = f.f_back
+    return depth
+
+
+# Source files of the frames which are part of a logging call.
+_logging_files = {logging.addLevelName.__code__.co_filename,
+                  stack_depth.__code__.co_filename}
+
+
+class DepthFilter(logging.Filter):
+    """
+    Record the stack depth of the logging call, for an IndentFormatter
+    formatting the record in another thread.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.depth = stack_depth()
+        return True
+
+
 class IndentFormatter(logging.Formatter):
     def __init__(self, fmt=None, datefmt=None) -> None:
         logging.Formatter.__init__(self, fmt, datefmt)
         self.base = None
 
     def format(self, record):
-        depth = len(traceback.extract_stack())
+        depth = getattr(record, 'depth', None)
+        if depth is None:
+            depth = stack_depth()
         if self.base is None:
             self.base = depth
         record.indent = '.' * (depth - self.base)
@@ -56,19 +88,43 @@ class ColorizedLogger:
         critical=dict(color='red', attrs=['bold']),
     )
 
-    levels = ('debug', 'info', 'warn', 'warning', 'error', 'critical')
+    levels = dict(debug=logging.DEBUG, info=logging.INFO,
+                  warn=logging.WARNING, warning=logging.WARNING,
+                  error=logging.ERROR, critical=logging.CRITICAL)
 
     def __init__(self, logger) -> None:
         self._log = logger
-        self.color = False
+        self._color = False
+
+    @property
+    def color(self) -> bool:
+        return self._color
+
+    @color.setter
+    def color(self, color: bool) -> None:
+        self._color = color
+        # Drop the level functions cached for the previous setting.
+        for name in self.levels:
+            self.__dict__.pop(name, None)
 
     def __getattr__(self, name):
-        if self.color:
-            if name in self.levels:
-                return lambda s, *args: getattr(self._log, name)(
-                    colored(s, **self.colormap[name]), *args)
+        if name not in self.levels:
+            return getattr(self._log, name)
+        # Level functions are built once and cached on the instance, so
+        # later lookups do not come here.
+        f = getattr(self._log, name)
+        if self._color:
+            f = self._colorize(f, self.levels[name], self.colormap[name])
+        setattr(self, name, f)
+        return f
 
-        return getattr(self._log, name)
+    def _colorize(self, f, level: int, options):
+        isEnabledFor = self._log.isEnabledFor
+
+        def log(msg, *args, **kwargs):
+            if isEnabledFor(level):
+                f(colored(msg, **options), *args, **kwargs)
+        return log
 
 
 class TerminalHandler(logging.Handler):
@@ -88,6 +144,48 @@ class TerminalHandler(logging.Handler):
         self.game.write(self.x, self.y, entry)
 
 
+# Types of the arguments which can be formatted later on, as they cannot
+# change in the meantime.
+IMMUTABLE_ARGS = (str, bytes, int, float, complex, type(None))
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler which leaves formatting the message to the listener, when
+    every argument is an immutable scalar or string. Messages with other
+    arguments, such as a list or a Cell, are formatted right away so that
+    they show the arguments as they were at the call.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(v, IMMUTABLE_ARGS) for v in values):
+                record.msg = record.getMessage()
+                record.args = None
+        if record.exc_info and not record.exc_text:
+            # Tracebacks refer to frames which may be gone later.
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Listeners of the queued loggers, stopped at exit.
+_listeners: List[logging.handlers.QueueListener] = []
+
+
+def stop_listeners() -> None:
+    """
+    Write out the records queued so far and stop the listener threads.
+    """
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_listeners)
+
+
 def create_logger(name: str, **options) -> ColorizedLogger:
     """
     Create a brand new logger.
@@ -104,9 +202,13 @@ def setup_logger(*loggers,
                  file: Union[str, pathlib.Path]=None, stdout: bool=False,
                  color: bool=False,
                  formatter=DEFAULT_FORMATTER,
-                 indent_formatter: bool=False) -> None:
+                 indent_formatter: bool=False,
+                 queued: bool=False) -> None:
     """
-    Setup logger.
+    Setup logger. With `queued`, records are put on a queue and written
+    by a listener thread, so logging does not block on I/O. Messages are
+    formatted by the listener unless an argument is mutable, see
+    LazyQueueHandler.
     """
     if isinstance(loggers, ColorizedLogger):
         loggers = [loggers]
@@ -118,16 +220,30 @@ def setup_logger(*loggers,
         if indent_formatter:
             formatter = INDENT_FORMATTER
 
+        handlers: List[logging.Handler] = []
         if file:
             if not isinstance(file, pathlib.Path):
                 file = pathlib.Path(file)
             fh = logging.FileHandler(str(file.absolute()), encoding='utf-8')
             fh.setFormatter(formatter)
             fh.setLevel(level)
-            logger.addHandler(fh)
+            handlers.append(fh)
         if stdout:
             sh = logging.StreamHandler(sys.stdout)
             sh.setFormatter(formatter)
             sh.setLevel(level)
-            logger.addHandler(sh)
+            handlers.append(sh)
+        if queued and handlers:
+            q: queue.SimpleQueue = queue.SimpleQueue()
+            qh = LazyQueueHandler(q)
+            if isinstance(formatter, IndentFormatter):
+                qh.addFilter(DepthFilter())
+            logger.addHandler(qh)
+            listener = logging.handlers.QueueListener(
+                q, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
         logger.color = color
@@ -0,0 +1,130 @@
+import hashlib
+import mmap
+import os
+import pathlib
+import struct
+from typing import Dict, List, NamedTuple, Union  # noqa
+
+MAGIC = b'TTMP'
+VERSION = 1
+
+# magic, version, width, height, SHA-256 of the map text
+HEADER = struct.Struct('<4sHII32s')
+
+# Suffix of compiled maps.
+SUFFIX = '.ttmap'
+
+# Character of a wall in text maps.
+WALL = '*'
+
+CACHE_DIR = pathlib.Path(os.environ.get('XDG_CACHE_HOME')
+                         or pathlib.Path.home() / '.cache') / 'tetris' / 'maps'
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class CompiledMap(NamedTuple):
+    width: int
+    height: int
+    rows: List[int]  # Walls of each row, bit x for column x
+    digest: bytes  # SHA-256 of the map text
+
+
+# Maps loaded in this process, by digest.
+_maps: Dict[bytes, CompiledMap] = {}
+
+
+def digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+def parse(text: str) -> CompiledMap:
+    """
+    Parse a text map. Every non-empty line is a row, with a `WALL` for
+    every wall. The width is the one of the first row.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    rows = []
+    for line in lines:
+        row = 0
+        x = line.find(WALL)
+        while x >= 0:
+            row |= 1 << x
+            x = line.find(WALL, x + 1)
+        rows.append(row)
+    width = len(lines[0]) if lines else 0
+    return CompiledMap(width, len(rows), rows, digest(text))
+
+
+def dump(m: CompiledMap) -> bytes:
+    """
+    Serialize a map: a header followed by the rows as little-endian
+    bitmasks of (width + 7) // 8 bytes each.
+    """
+    stride = (m.width + 7) // 8
+    return HEADER.pack(MAGIC, VERSION, m.width, m.height, m.digest) \
+        + b''.join(row.to_bytes(stride, 'little') for row in m.rows)
+
+
+def compile_map(text: str) -> bytes:
+    return dump(parse(text))
+
+
+def load(data: Buffer) -> CompiledMap:
+    """
+    Load a compiled map from any buffer, e.g. an mmap of a file.
+    """
+    magic, version, width, height, sha = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a compiled tetris map')
+    if version != VERSION:
+        raise ValueError(f'Unsupported map version {version}')
+    stride = (width + 7) // 8
+    if len(data) < HEADER.size + stride * height:
+        raise ValueError('Truncated map')
+    view = memoryview(data)[HEADER.size:HEADER.size + stride * height]
+    rows = [int.from_bytes(view[n:n + stride], 'little')
+            for n in range(0, stride * height, stride)]
+    view.release()
+    return CompiledMap(width, height, rows, sha)
+
+
+def load_file(path: pathlib.Path) -> CompiledMap:
+    """
+    Load the compiled map at `path`, mapped into memory.
+    """
+    with path.open('rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return load(data)
+
+
+def cached(text: str, cache_dir: pathlib.Path=None) -> CompiledMap:
+    """
+    Get the compiled map of a text map. Maps are compiled once per
+    process, and with a `cache_dir` once into it, named after the hash of
+    their text. Maps are compiled in memory if the cache cannot be written.
+    """
+    sha = digest(text)
+    m = _maps.get(sha)
+    if m is not None:
+        return m
+    if cache_dir is None:
+        m = _maps[sha] = parse(text)
+        return m
+    path = cache_dir / (sha.hex() + SUFFIX)
+    try:
+        m = load_file(path)
+    except (OSError, ValueError, struct.error):
+        m = None
+    if m is None or m.digest != sha:
+        m = parse(text)
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+            tmp.write_bytes(dump(m))
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    _maps[sha] = m
+    return m
@@ -0,0 +1,187 @@
+import concurrent.futures
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type  # noqa
+from .autoplay import Board, Placement, TranspositionCache, Weights, \
+    WEIGHTS, player_placements, ranked_placements
+from .game import Game, Tetrimino, SPAWN
+
+# Search cache of this process, shared by the searches run in it.
+_cache: Optional[TranspositionCache] = None
+
+
+def process_cache() -> TranspositionCache:
+    global _cache
+    if _cache is None:
+        _cache = TranspositionCache()
+    return _cache
+
+
+def spawn_position(board: Board, cls: Type[Tetrimino]
+                   ) -> Optional[Tuple[int, int]]:
+    """
+    Get the position of the first cell of a `cls` piece spawned on
+    `board`, after Game.add_player moved it down. Return None if it cannot
+    move down, i.e. the board is topped out.
+    """
+    x, y = SPAWN
+    px, py = cls.shape[0]
+    x, y = x + px, y + py + 1
+    if not board.fits(cls.rotations[0], x, y):
+        return None
+    return x, y
+
+
+class Node(NamedTuple):
+    board: Board
+    lines: int  # Lines cleared on the way to the board
+    score: float
+
+
+def search(board: Board, cls: Type[Tetrimino], state: int,
+           placement: Placement, pieces: List[Type[Tetrimino]],
+           weights: Weights=WEIGHTS, beam: int=8,
+           deadline: float=None) -> List[float]:
+    """
+    Beam search the placements of `pieces` after `placement` of a `cls`
+    piece ending in rotation `state` on `board`, keeping the `beam` best
+    boards of every level.
+
+    Return the best score of every level searched, the one of `placement`
+    first. A level where every board tops out scores -inf. No level is
+    started after `deadline`, a time.monotonic() value.
+    """
+    cache = process_cache()
+    nodes = [Node(board.place(cls.rotations[state], placement.x,
+                              placement.y),
+                  placement.lines, placement.score)]
+    scores = [placement.score]
+    for piece in pieces:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        candidates = []
+        for node in nodes:
+            spawn = spawn_position(node.board, piece)
+            if spawn is None:
+                continue
+            found = ranked_placements(node.board, piece, 0, spawn[0],
+                                      spawn[1], weights, cache)
+            for p in found[:beam]:
+                candidates.append(
+                    (p.score + weights.lines * node.lines, node, p))
+        if not candidates:
+            scores.append(float('-inf'))
+            break
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        nodes = [Node(node.board.place(piece.rotations[p.rotations], p.x,
+                                       p.y), node.lines + p.lines, score)
+                 for score, node, p in candidates[:beam]]
+        scores.append(nodes[0].score)
+    return scores
+
+
+def pick(results: List[List[float]]) -> int:
+    """
+    Pick the best of the search `results` of the placements. Placements
+    which top out are only taken if all of them do, and the ones searched
+    the deepest are compared at the deepest level.
+    """
+    lost = float('-inf')
+    candidates = [n for n, scores in enumerate(results)
+                  if lost not in scores] or list(range(len(results)))
+    finite = {n: [s for s in results[n] if s != lost] for n in candidates}
+    level = max(len(scores) for scores in finite.values()) - 1
+    deepest = [n for n in candidates if len(finite[n]) > level]
+    return max(deepest, key=lambda n: finite[n][level])
+
+
+def ready() -> None:
+    """
+    Nothing to do, run to start the processes of a pool.
+    """
+
+
+class Planner:
+    """
+    Lookahead placement search with the preview queue.
+
+    Every placement of the player is expanded by a beam search over the
+    placements of the next `depth` pieces, keeping the `beam` best boards
+    of every level. The placements of the player are expanded in parallel
+    on a pool of `workers` processes, or in this process if `workers` is
+    1. Once `budget` seconds have passed, searches stop going deeper, the
+    placements which are not searched yet are left out, and the best
+    placement among the ones searched the deepest is taken.
+    """
+    def __init__(self, depth: int=1, beam: int=8, workers: int=None,
+                 budget: float=None, weights: Weights=WEIGHTS) -> None:
+        self.depth = depth
+        self.beam = beam
+        self.workers = workers or os.cpu_count() or 1
+        self.budget = budget
+        self.weights = weights
+        self.pool: concurrent.futures.ProcessPoolExecutor = None
+
+    def __enter__(self) -> 'Planner':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """
+        Start the worker processes, so that the first plan does not pay for
+        it.
+        """
+        if self.workers == 1 or self.pool:
+            return
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+        concurrent.futures.wait([self.pool.submit(ready)
+                                 for _ in range(self.workers)])
+
+    def close(self) -> None:
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+
+    def plan(self, game: Game) -> Optional[Placement]:
+        """
+        Find the best placement of the player of `game`.
+        """
+        deadline = None if self.budget is None \
+            else time.monotonic() + self.budget
+        board, found = player_placements(game, self.weights, process_cache())
+        if len(found) < 2 or not self.depth:
+            return found[0] if found else None
+        player = game.player
+        cls = type(player)
+        pieces = [type(game.next_player)] + game.preview(self.depth - 1)
+        args = [(board, cls, (player.rotation + p.rotations) % cls.states, p,
+                 pieces, self.weights, self.beam, deadline) for p in found]
+
+        # Searches of the placements which finished in time, by index.
+        results: Dict[int, List[float]] = {}
+        if self.workers == 1:
+            for n, a in enumerate(args):
+                if n and deadline is not None and time.monotonic() >= deadline:
+                    break
+                results[n] = search(*a)
+        else:
+            self.start()
+            futures = {self.pool.submit(search, *a): n
+                       for n, a in enumerate(args)}
+            timeout = None if deadline is None \
+                else max(deadline - time.monotonic(), 0)
+            done, pending = concurrent.futures.wait(futures, timeout)
+            for future in pending:
+                # Running searches stop at their next level past the
+                # deadline.
+                future.cancel()
+            for future in done:
+                results[futures[future]] = future.result()
+        if not results:
+            return found[0]
+
+        indices = sorted(results)
+        return found[indices[pick([results[n] for n in indices])]]
@@ -0,0 +1,134 @@
+import pathlib
+import struct
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, \
+    Tuple  # noqa
+from .exceptions import Exit
+from .game import Game
+from .generator import Randomizer
+from .headless import HeadlessBackend, VirtualClock
+from .terminal import Terminal
+
+MAGIC = b'TTRP'
+VERSION = 1
+
+# magic, version, randomizer, seed
+HEADER = struct.Struct('<4sBBQ')
+
+# tick, flags, key, uch
+EVENT = struct.Struct('<IBHI')
+
+# Event flags.
+HAS_KEY = 0x01
+HAS_UCH = 0x02
+END = 0x80  # Last tick of the session.
+
+RANDOMIZERS = list(Randomizer)
+
+# Events are written out in blocks of this many bytes.
+FLUSH_SIZE = 1 << 16
+
+
+class Recorder:
+    """
+    Binary log of the key events dispatched in a game.
+
+    The log starts with the seed and randomizer of the piece generator,
+    followed by one fixed-size record per event with the tick it was
+    dispatched on. Replaying the events on the same ticks plays the same
+    game.
+    """
+    def __init__(self, f: BinaryIO, seed: int,
+                 randomizer: Randomizer) -> None:
+        self.f = f
+        self.buf = bytearray(HEADER.pack(
+            MAGIC, VERSION, RANDOMIZERS.index(Randomizer(randomizer)), seed))
+        self.count = 0
+
+    @classmethod
+    def open(cls, path: pathlib.Path, game: Game) -> 'Recorder':
+        """
+        Start recording `game` to the file at `path`.
+        """
+        return cls(path.open('wb'), game.pieces.seed, game.pieces.randomizer)
+
+    def record(self, tick: int, key: Optional[int], uch: str=None) -> None:
+        flags = 0
+        if key is not None:
+            flags |= HAS_KEY
+        if uch:
+            flags |= HAS_UCH
+        self.buf += EVENT.pack(tick, flags, key or 0, ord(uch) if uch else 0)
+        self.count += 1
+        if len(self.buf) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        self.f.write(self.buf)
+        del self.buf[:]
+
+    def close(self, tick: int) -> None:
+        """
+        Mark `tick` as the end of the session and close the log.
+        """
+        self.buf += EVENT.pack(tick, END, 0, 0)
+        self.flush()
+        self.f.close()
+
+
+class Recording(NamedTuple):
+    seed: int
+    randomizer: Randomizer
+    events: List[Tuple[int, Optional[int], Optional[str]]]
+    end: Optional[int]  # None if the session was not closed
+
+
+def parse(data: bytes) -> Recording:
+    magic, version, randomizer, seed = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a tetris recording')
+    if version != VERSION:
+        raise ValueError(f'Unsupported recording version {version}')
+    events = []
+    end = None
+    size = len(data) - (len(data) - HEADER.size) % EVENT.size
+    for tick, flags, key, uch in EVENT.iter_unpack(data[HEADER.size:size]):
+        if flags & END:
+            end = tick
+            break
+        events.append((tick, key if flags & HAS_KEY else None,
+                       chr(uch) if flags & HAS_UCH else None))
+    return Recording(seed, RANDOMIZERS[randomizer], events, end)
+
+
+def load(path: pathlib.Path) -> Recording:
+    with path.open('rb') as f:
+        return parse(f.read())
+
+
+def replay(recording: Recording, terminal: Terminal=None,
+           render: bool=False) -> Game:
+    """
+    Play a recording in a headless game as fast as possible. The game is
+    only rendered with `render`. Return the finished game.
+    """
+    if terminal is None:
+        terminal = Terminal(backend=HeadlessBackend())
+    game = Game(terminal, clock=VirtualClock(), seed=recording.seed,
+                randomizer=recording.randomizer)
+    time_of = game.scheduler.time_of
+    try:
+        game.start()
+        for tick, key, uch in recording.events:
+            game.update(time_of(tick))
+            game.dispatch(key, uch)
+            if render:
+                game.render()
+        if recording.end is not None:
+            game.update(time_of(recording.end))
+            if render:
+                game.render()
+    except Exit:
+        pass
+    finally:
+        terminal.close()
+    return game
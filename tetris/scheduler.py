@@ -0,0 +1,86 @@
+import time
+from typing import Callable, Dict, Optional, Tuple  # noqa
+
+
+class Scheduler:
+    """
+    Fixed-timestep scheduler.
+
+    Time on a monotonic clock is divided into ticks of `1 / rate` seconds.
+    Events are scheduled on tick numbers, so catching up after an overrun
+    processes them in the same order as if no frame had been late.
+    """
+    def __init__(self, rate: int,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        self.rate = rate
+        self.clock = clock
+        self.start = clock()
+        self.tick = 0
+        self.events: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        """
+        Restart counting ticks from now.
+        """
+        self.start = self.clock()
+        self.tick = 0
+        self.events.clear()
+
+    def tick_at(self, t: float) -> int:
+        """
+        Get the tick number at the clock time `t`.
+        """
+        # The epsilon keeps a tick boundary from rounding down to the
+        # previous tick.
+        return int((t - self.start) * self.rate + 1e-9)
+
+    def time_of(self, tick: int) -> float:
+        """
+        Get the clock time at which `tick` starts.
+        """
+        return self.start + tick / self.rate
+
+    def timeout(self, tick: Optional[int]) -> Optional[float]:
+        """
+        Get the seconds left until `tick`, or None if `tick` is None.
+        """
+        if tick is None:
+            return None
+        return max(self.time_of(tick) - self.clock(), 0.0)
+
+    def schedule(self, name: str, tick: int) -> None:
+        """
+        Schedule the event `name` at `tick`, replacing any pending one.
+        """
+        # Moved to the end, as ties are popped in the order of `events`.
+        self.events.pop(name, None)
+        self.events[name] = tick
+
+    def cancel(self, name: str) -> None:
+        self.events.pop(name, None)
+
+    def scheduled(self, name: str) -> bool:
+        return name in self.events
+
+    def next_tick(self) -> Optional[int]:
+        """
+        Get the tick of the earliest pending event.
+        """
+        if not self.events:
+            return None
+        return min(self.events.values())
+
+    def pop(self, until: int) -> Optional[Tuple[int, str]]:
+        """
+        Pop the earliest event scheduled at or before `until`. Events
+        scheduled on the same tick are popped in scheduling order.
+        """
+        if not self.events:
+            return None
+        name = min(self.events, key=self.events.__getitem__)
+        tick = self.events[name]
+        if tick > until:
+            return None
+        del self.events[name]
+        self.tick = max(self.tick, tick)
+        return tick, name
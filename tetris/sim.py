@@ -0,0 +1,152 @@
+import concurrent.futures
+import os
+import random
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple  # noqa
+from .autoplay import Autoplayer
+from .exceptions import StatusCode
+from .game import Game
+from .generator import Randomizer
+from .headless import HeadlessBackend, ScriptEvent
+from .terminal import Terminal, MouseKey
+
+# Keys pressed by the random policy.
+RANDOM_KEYS = [MouseKey.Left, MouseKey.Right, MouseKey.Enter,
+               MouseKey.Down, MouseKey.Space]
+
+
+def random_policy(seed: int, rate: float=8.0) -> Iterator[ScriptEvent]:
+    """
+    Press random keys, `rate` times per second on average.
+    """
+    rng = random.Random(seed)
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate)
+        yield t, rng.choice(RANDOM_KEYS), None
+
+
+def drop_policy(seed: int, rate: float=8.0) -> Iterator[ScriptEvent]:
+    """
+    Shift each piece by a random amount and hard drop it.
+    """
+    rng = random.Random(seed)
+    t = 0.0
+    while True:
+        key = rng.choice([MouseKey.Left, MouseKey.Right])
+        for _ in range(rng.randrange(6)):
+            t += 1 / rate
+            yield t, key, None
+        t += 1 / rate
+        yield t, MouseKey.Space, None
+
+
+def auto_policy(seed: int) -> Iterator[ScriptEvent]:
+    """
+    Press no keys. The game is played by an Autoplayer, see simulate.
+    """
+    return iter(())
+
+
+POLICIES: Dict[str, Callable[[int], Iterator[ScriptEvent]]] = {
+    'random': random_policy,
+    'drop': drop_policy,
+    'auto': auto_policy,
+}
+
+# Ticks between the actions of the autoplayer of the auto policy.
+AUTOPLAY_INTERVAL = 1
+
+
+class GameStats(NamedTuple):
+    seed: int
+    status: int
+    pieces: int
+    lines: int
+    frames: int
+    ticks: int
+    wall_time: float
+
+
+class BatchStats(NamedTuple):
+    games: List[GameStats]
+    workers: int
+    wall_time: float
+
+    @property
+    def pieces(self) -> int:
+        return sum(g.pieces for g in self.games)
+
+    @property
+    def lines(self) -> int:
+        return sum(g.lines for g in self.games)
+
+    @property
+    def frames(self) -> int:
+        return sum(g.frames for g in self.games)
+
+    @property
+    def cpu_time(self) -> float:
+        """
+        Time spent playing, summed over all games.
+        """
+        return sum(g.wall_time for g in self.games)
+
+    @property
+    def pieces_per_sec(self) -> float:
+        return self.pieces / self.wall_time if self.wall_time else 0.0
+
+    def summary(self) -> str:
+        per_core = self.pieces / self.cpu_time if self.cpu_time else 0.0
+        return '\n'.join([
+            f'games:          {len(self.games)}',
+            f'workers:        {self.workers}',
+            f'wall time:      {self.wall_time:.3f}s',
+            f'wall time/core: {self.cpu_time / self.workers:.3f}s',
+            f'pieces:         {self.pieces}',
+            f'lines cleared:  {self.lines}',
+            f'frames:         {self.frames}',
+            f'pieces/sec:     {self.pieces_per_sec:.1f}',
+            f'pieces/sec/core: {per_core:.1f}',
+        ])
+
+
+def simulate(seed: int, policy: str='random', duration: float=None,
+             randomizer: str=Randomizer.Uniform.value) -> GameStats:
+    """
+    Play one headless game driven by `policy` and return its stats.
+    """
+    backend = HeadlessBackend(script=POLICIES[policy](seed))
+    started = time.perf_counter()
+    with Game(Terminal(backend=backend), seed=seed,
+              randomizer=Randomizer(randomizer)) as game:
+        if policy == 'auto':
+            game.autoplayer = Autoplayer(interval=AUTOPLAY_INTERVAL)
+        status = game.run(duration)
+    wall_time = time.perf_counter() - started
+    return GameStats(seed=seed, status=int(status), pieces=game.placed,
+                     lines=game.lines, frames=game.frames,
+                     ticks=game.scheduler.tick, wall_time=wall_time)
+
+
+def run_batch(games: int, workers: int=None, seed: int=0,
+              policy: str='random', duration: float=None,
+              randomizer: str=Randomizer.Uniform.value) -> BatchStats:
+    """
+    Play `games` headless games on a pool of `workers` processes. Game n
+    is seeded with `seed + n`.
+    """
+    workers = workers or os.cpu_count() or 1
+    seeds = [seed + n for n in range(games)]
+    started = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        results = list(pool.map(
+            simulate, seeds, [policy] * games, [duration] * games,
+            [randomizer] * games,
+            chunksize=max(games // (workers * 4), 1)))
+    wall_time = time.perf_counter() - started
+    failed = [r for r in results if r.status == StatusCode.Error]
+    if failed:
+        raise RuntimeError(f'{len(failed)} games failed, '
+                           f'e.g. seed {failed[0].seed}')
+    return BatchStats(games=results, workers=workers, wall_time=wall_time)
@@ -0,0 +1,294 @@
+import array
+import mmap
+import pathlib
+import struct
+from typing import Any, Dict, List, Optional, Union  # noqa
+from .game import Game, GameObject, Map, Text, Tetrimino, TETRIMINOS
+from .generator import PieceGenerator, Randomizer
+from .headless import HeadlessBackend, VirtualClock
+from .sparse import SparseField
+from .terminal import Terminal, Cell, Color
+
+MAGIC = b'TTSN'
+VERSION = 4
+
+# magic, version, number of sections
+HEADER = struct.Struct('<4sHH')
+
+# offset, size of a section
+SECTION = struct.Struct('<II')
+
+# Sections in the order of the section table.
+META, OBJECTS, CELLS, FIELD, EVENTS, RNG, QUEUE, TEXT = range(8)
+SECTIONS = 8
+
+# field width, field height, tick, frames, placed, lines, seed,
+# randomizer, generator head, generator count, player, next player,
+# message, flags, SHA-256 of the map text
+META_RECORD = struct.Struct('<HHIQQQQBIQiiiB32s')
+
+# kind, rotation, flags, fg, bg, x, y, first cell, number of cells.
+# Texts store the offset and size of their text in the TEXT section
+# instead of cells.
+OBJECT_RECORD = struct.Struct('<BBBhhhhII')
+
+# x, y, fg, bg, c, scale
+CELL_RECORD = struct.Struct('<hhhhIB')
+
+# Chunk size of a SparseField, 0 for a Field. Followed by the records.
+FIELD_HEADER = struct.Struct('<I')
+
+# Occupied field position: x, y, object, cell of the object or -1, flags
+FIELD_RECORD = struct.Struct('<HHIhB')
+
+# name, tick
+EVENT_RECORD = struct.Struct('<12sI')
+
+# Mersenne Twister state: version, 625 words, has gauss_next, gauss_next
+RNG_RECORD = struct.Struct('<B625IBd')
+
+# Object kinds. Pieces are their index in TETRIMINOS.
+KIND_PIECE = len(TETRIMINOS)  # A Tetrimino split off another one
+KIND_TEXT = KIND_PIECE + 1
+KIND_MAP = KIND_TEXT + 1  # Cells are rebuilt from the map data
+
+# Object flags.
+GRAVITY = 0x01
+COLLIDABLE = 0x02
+
+# Field flags.
+MAP_ROW = 0x01  # Set in Field.map_row
+
+# Game flags.
+WILL_SPAWN = 0x01
+DIRTY = 0x02
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def game_objects(game: Game) -> List[GameObject]:
+    """
+    Get the objects of `game` to be saved, in field order.
+    """
+    objs = game.field.children
+    for o in (game.player, game.next_player):
+        if o is not None and o not in objs:
+            objs.append(o)
+    return objs
+
+
+def object_kind(obj: GameObject) -> int:
+    if isinstance(obj, Map):
+        return KIND_MAP
+    if isinstance(obj, Text):
+        return KIND_TEXT
+    cls = type(obj)
+    if cls in TETRIMINOS:
+        return TETRIMINOS.index(cls)
+    if isinstance(obj, Tetrimino):
+        return KIND_PIECE
+    raise ValueError(f'Cannot snapshot {obj!r}')
+
+
+def dump(game: Game) -> bytes:
+    """
+    Serialize the state of `game`.
+    """
+    objs = game_objects(game)
+    index = {id(o): n for n, o in enumerate(objs)}
+
+    objects = bytearray()
+    cells = bytearray()
+    ncells = 0
+    # Index of every cell within its object.
+    cell_index: Dict[int, int] = {}
+    text = bytearray()
+    for obj in objs:
+        kind = object_kind(obj)
+        flags = (GRAVITY if obj.gravity else 0) \
+            | (COLLIDABLE if obj.collidable else 0)
+        first = ncells
+        if kind == KIND_TEXT:
+            obj_cells: List[Cell] = []
+            encoded = obj.text.encode('utf-8')
+            first, size = len(text), len(encoded)
+            text += encoded
+        elif kind == KIND_MAP:
+            obj_cells = []
+            size = 0
+        else:
+            obj_cells = obj.cells
+            size = len(obj_cells)
+        objects += OBJECT_RECORD.pack(
+            kind, getattr(obj, 'rotation', 0), flags, obj.fg, obj.bg,
+            obj.pos.x or 0, obj.pos.y or 0, first, size)
+        for n, cell in enumerate(obj_cells):
+            cells += CELL_RECORD.pack(cell.x, cell.y, cell.fg, cell.bg,
+                                      cell.c, cell.scale)
+            cell_index[id(cell)] = n
+        ncells += len(obj_cells)
+
+    field = game.field
+    grid = bytearray(FIELD_HEADER.pack(
+        field.chunk if isinstance(field, SparseField) else 0))
+    for y in range(field.height):
+        line = field.row(y)
+        map_line = field.map_row(y)
+        x = 0
+        while line:
+            if line & 1:
+                info = field.get(x, y)
+                grid += FIELD_RECORD.pack(
+                    x, y, index[id(info.obj)],
+                    -1 if info.cell is None else cell_index[id(info.cell)],
+                    MAP_ROW if map_line >> x & 1 else 0)
+            line >>= 1
+            x += 1
+
+    events = b''.join(EVENT_RECORD.pack(name.encode('ascii'), tick)
+                      for name, tick in game.scheduler.events.items())
+
+    pieces = game.pieces
+    version, words, gauss = pieces.rng.getstate()
+    rng = RNG_RECORD.pack(version, *words, gauss is not None, gauss or 0.0)
+
+    flags = (WILL_SPAWN if game.will_spawn else 0) \
+        | (DIRTY if game.dirty else 0)
+    meta = META_RECORD.pack(
+        game.field.width, game.field.height, game.scheduler.tick,
+        game.frames, game.placed, game.lines, pieces.seed,
+        list(Randomizer).index(pieces.randomizer), pieces.head,
+        pieces.count, index.get(id(game.player), -1),
+        index.get(id(game.next_player), -1),
+        index.get(id(game.message), -1), flags, game.map.digest)
+
+    sections = [meta, objects, cells, grid, events, rng,
+                pieces.queue.tobytes(), text]
+    out = bytearray(HEADER.pack(MAGIC, VERSION, SECTIONS))
+    offset = HEADER.size + SECTION.size * SECTIONS
+    for data in sections:
+        out += SECTION.pack(offset, len(data))
+        offset += len(data)
+    for data in sections:
+        out += data
+    return bytes(out)
+
+
+def section(data: Buffer, n: int) -> memoryview:
+    offset, size = SECTION.unpack_from(data, HEADER.size + SECTION.size * n)
+    return memoryview(data)[offset:offset + size]
+
+
+def restore(data: Buffer, game: Game=None) -> Game:
+    """
+    Restore a snapshot into `game`, or into a new headless game with a
+    virtual clock. `data` may be any buffer, e.g. an mmap of a snapshot
+    file.
+    """
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a tetris snapshot')
+    if version != VERSION or count != SECTIONS:
+        raise ValueError(f'Unsupported snapshot version {version}')
+    if game is None:
+        game = Game(Terminal(backend=HeadlessBackend()), clock=VirtualClock())
+
+    (width, height, tick, frames, placed, lines, seed, randomizer, head,
+     count, player, next_player, message, flags, map_digest) = \
+        META_RECORD.unpack_from(section(data, META))
+    if (width, height) != (game.field.width, game.field.height):
+        raise ValueError(f'Snapshot of a {width}x{height} field')
+    if map_digest != game.map.digest.ljust(32, b'\0'):
+        raise ValueError('Snapshot of another map')
+    grid = section(data, FIELD)
+    chunk, = FIELD_HEADER.unpack_from(grid)
+    field_cls = type(game.field)
+    if bool(chunk) != issubclass(field_cls, SparseField):
+        name = 'SparseField' if chunk else 'Field'
+        raise ValueError(f'Snapshot of a {name}')
+
+    cells = [Cell(x, y, Color(fg), Color(bg), c, bool(scale))
+             for x, y, fg, bg, c, scale
+             in CELL_RECORD.iter_unpack(section(data, CELLS))]
+    text = bytes(section(data, TEXT))
+
+    if chunk:
+        field = field_cls(width, height, chunk)
+    else:
+        field = field_cls(width, height)
+    # The map cells are put back with the others below.
+    field.map = game.map
+    game.field = field
+    objs: List[GameObject] = []
+    for kind, rotation, oflags, fg, bg, x, y, first, n in \
+            OBJECT_RECORD.iter_unpack(section(data, OBJECTS)):
+        obj: GameObject
+        if kind == KIND_MAP:
+            objs.append(game.map)
+            continue
+        if kind == KIND_TEXT:
+            obj = Text(x=x, y=y, text=text[first:first + n].decode('utf-8'))
+        else:
+            if kind == KIND_PIECE:
+                obj = Tetrimino(x, y, Color(bg))
+            else:
+                obj = TETRIMINOS[kind](x, y)
+            obj.cells = cells[first:first + n]
+            obj.rotation = rotation
+        obj.fg, obj.bg = Color(fg), Color(bg)
+        obj.gravity = bool(oflags & GRAVITY)
+        obj.collidable = bool(oflags & COLLIDABLE)
+        obj.parent = game
+        objs.append(obj)
+
+    for x, y, owner, cell, fflags in \
+            FIELD_RECORD.iter_unpack(grid[FIELD_HEADER.size:]):
+        obj = objs[owner]
+        field.set_at(x, y, obj, obj.cells[cell] if cell >= 0 else None)
+        if fflags & MAP_ROW:
+            field.mark_map(x, y)
+    # Objects are updated and rendered in the order of the field.
+    field.objects = {id(o): o for o in objs if id(o) in field.objects}
+    game.player = objs[player] if player >= 0 else None
+    game.next_player = objs[next_player] if next_player >= 0 else None
+    game.message = objs[message] if message >= 0 else None
+
+    scheduler = game.scheduler
+    scheduler.events = {
+        name.rstrip(b'\0').decode('ascii'): t for name, t
+        in EVENT_RECORD.iter_unpack(section(data, EVENTS))}
+    scheduler.tick = tick
+    # Continue counting ticks from the current time.
+    scheduler.start = scheduler.clock() - tick / scheduler.rate
+
+    pieces = PieceGenerator(len(TETRIMINOS), seed,
+                            list(Randomizer)[randomizer])
+    state = RNG_RECORD.unpack_from(section(data, RNG))
+    gauss = state[-1] if state[-2] else None
+    pieces.rng.setstate((state[0], tuple(state[1:-2]), gauss))
+    pieces.queue = array.array('b', bytes(section(data, QUEUE)))
+    pieces.head = head
+    pieces.count = count
+    game.pieces = pieces
+
+    game.frames = frames
+    game.placed = placed
+    game.lines = lines
+    game.will_spawn = bool(flags & WILL_SPAWN)
+    game.dirty = bool(flags & DIRTY)
+    game.rendered = None
+    return game
+
+
+def save(game: Game, path: pathlib.Path) -> None:
+    with path.open('wb') as f:
+        f.write(dump(game))
+
+
+def load(path: pathlib.Path, game: Game=None) -> Game:
+    """
+    Restore the snapshot in the file at `path`, mapped into memory.
+    """
+    with path.open('rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return restore(data, game)
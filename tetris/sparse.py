@@ -0,0 +1,307 @@
+import bisect
+from typing import Dict, List, Set, Tuple  # noqa
+from .game import Field, FieldInfo, GameObject, Tetrimino, Cell, \
+    splitmix64, logger
+from .logging import Level
+from .terminal import cell_positions
+
+# Width and height of a chunk.
+CHUNK = 64
+
+
+class Chunk:
+    """
+    Square tile of a SparseField: row and column bitmasks like a Field,
+    and the owners and cells of the occupied positions, y * size + x.
+    """
+    __slots__ = ('rows', 'map_rows', 'columns', 'owners', 'cells')
+
+    def __init__(self, size: int) -> None:
+        self.rows = [0] * size
+        self.map_rows = [0] * size
+        self.columns = [0] * size
+        self.owners: Dict[int, GameObject] = {}
+        self.cells: Dict[int, Cell] = {}
+
+
+class SparseField(Field):
+    """
+    Field stored in `chunk` x `chunk` tiles, for very large maps.
+
+    A tile is allocated when one of its cells is set and freed when its
+    last cell is cleared, and only keeps the owners of its occupied cells,
+    so memory scales with the occupied area. The tiles of every tile row
+    and column are indexed, so that line clears and falls only visit the
+    tiles in use.
+    """
+    def __init__(self, width: int, height: int, chunk: int=CHUNK) -> None:
+        self.chunk = chunk
+        super().__init__(width, height)
+
+    def allocate(self) -> None:
+        self.chunks: Dict[Tuple[int, int], Chunk] = {}
+        # Sorted chunk rows of every chunk column, and the other way round.
+        self.chunk_rows: Dict[int, List[int]] = {}
+        self.chunk_columns: Dict[int, List[int]] = {}
+        # Rows where a tile row within the map filled up since the last
+        # line clear. Only these can be filled lines.
+        self.filled_rows: Set[int] = set()
+
+    def _chunk(self, cx: int, cy: int) -> Chunk:
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            chunk = self.chunks[cx, cy] = Chunk(self.chunk)
+            bisect.insort(self.chunk_rows.setdefault(cx, []), cy)
+            bisect.insort(self.chunk_columns.setdefault(cy, []), cx)
+        return chunk
+
+    def _free(self, cx: int, cy: int) -> None:
+        del self.chunks[cx, cy]
+        for index, key, value in ((self.chunk_rows, cx, cy),
+                                  (self.chunk_columns, cy, cx)):
+            values = index[key]
+            values.remove(value)
+            if not values:
+                del index[key]
+
+    def row(self, y: int) -> int:
+        size = self.chunk
+        cy, ly = divmod(y, size)
+        line = 0
+        for cx in self.chunk_columns.get(cy, ()):
+            line |= self.chunks[cx, cy].rows[ly] << (cx * size)
+        return line
+
+    def map_row(self, y: int) -> int:
+        size = self.chunk
+        cy, ly = divmod(y, size)
+        line = 0
+        for cx in self.chunk_columns.get(cy, ()):
+            line |= self.chunks[cx, cy].map_rows[ly] << (cx * size)
+        return line
+
+    def column(self, x: int) -> int:
+        size = self.chunk
+        cx, lx = divmod(x, size)
+        column = 0
+        for cy in self.chunk_rows.get(cx, ()):
+            column |= self.chunks[cx, cy].columns[lx] << (cy * size)
+        return column
+
+    def key(self, x: int, y: int) -> int:
+        return splitmix64(y * self.width + x)
+
+    def mark_map(self, x: int, y: int) -> None:
+        size = self.chunk
+        chunk = self._chunk(x // size, y // size)
+        chunk.map_rows[y % size] |= 1 << (x % size)
+
+    def owner(self, x: int, y: int) -> GameObject:
+        if not self.contains(x, y):
+            return None
+        size = self.chunk
+        chunk = self.chunks.get((x // size, y // size))
+        if chunk is None:
+            return None
+        return chunk.owners.get(y % size * size + x % size)
+
+    def occupied(self, x: int, y: int) -> bool:
+        if not self.contains(x, y):
+            return False
+        size = self.chunk
+        chunk = self.chunks.get((x // size, y // size))
+        return chunk is not None \
+            and bool(chunk.rows[y % size] >> (x % size) & 1)
+
+    def obstacle(self, obj: GameObject, x: int, y: int) -> GameObject:
+        if not 0 <= x < self.width or y >= self.height:
+            return self.map
+        if y < 0:
+            return None
+        size = self.chunk
+        chunk = self.chunks.get((x // size, y // size))
+        if chunk is None:
+            return None
+        other = chunk.owners.get(y % size * size + x % size)
+        if other is None or other is obj or not other.collidable:
+            return None
+        return other
+
+    def surface(self, obj: GameObject, x: int, y: int) -> int:
+        if not 0 <= x < self.width:
+            return y
+        size = self.chunk
+        start = max(y + 1, 0)
+        cx, lx = divmod(x, size)
+        cys = self.chunk_rows.get(cx, [])
+        for cy in cys[bisect.bisect_left(cys, start // size):]:
+            chunk = self.chunks[cx, cy]
+            column = chunk.columns[lx]
+            if cy == start // size:
+                column &= ~((1 << (start % size)) - 1)
+            while column:
+                low = column & -column
+                ly = low.bit_length() - 1
+                other = chunk.owners[ly * size + lx]
+                if other is not obj and other.collidable:
+                    return cy * size + ly
+                column ^= low
+        return self.height
+
+    def set_at(self, x: int, y: int, obj: GameObject,
+               cell: Cell=None) -> None:
+        if not self.contains(x, y):
+            return
+        size = self.chunk
+        cy, ly = divmod(y, size)
+        cx, lx = divmod(x, size)
+        chunk = self._chunk(cx, cy)
+        bit = 1 << lx
+        if not chunk.rows[ly] & bit:
+            self.hash ^= splitmix64(y * self.width + x)
+        line = chunk.rows[ly] = chunk.rows[ly] | bit
+        chunk.columns[lx] |= 1 << ly
+        if obj is self.map:
+            chunk.map_rows[ly] |= bit
+        m = self.map
+        if m is not None and y < m.height and cx * size < m.width:
+            full = (1 << min(size, m.width - cx * size)) - 1
+            if line & full == full:
+                self.filled_rows.add(y)
+        n = ly * size + lx
+        prev = chunk.owners.get(n)
+        if prev is not obj:
+            if prev is not None:
+                self.release(prev)
+            self.acquire(obj)
+        chunk.owners[n] = obj
+        chunk.cells[n] = cell
+
+    def get(self, x: int, y: int) -> FieldInfo:
+        if not self.contains(x, y):
+            logger.warn(f'Out of range access ({x},{y})')
+            return None
+        size = self.chunk
+        chunk = self.chunks.get((x // size, y // size))
+        if chunk is None:
+            return None
+        n = y % size * size + x % size
+        obj = chunk.owners.get(n)
+        if obj is None:
+            return None
+        return FieldInfo(x, y, obj, chunk.cells[n])
+
+    def clear(self, obj: GameObject) -> None:
+        if not obj:
+            return
+        size = self.chunk
+        chunks = self.chunks
+        for x, y in cell_positions(obj.make_cells()):
+            if not self.contains(x, y):
+                continue
+            chunk = chunks.get((x // size, y // size))
+            if chunk is not None \
+                    and chunk.owners.get(y % size * size + x % size) is obj:
+                self.clear_at(x, y)
+
+    def clear_at(self, x: int, y: int) -> None:
+        if not self.contains(x, y):
+            return
+        size = self.chunk
+        cy, ly = divmod(y, size)
+        cx, lx = divmod(x, size)
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            return
+        n = ly * size + lx
+        obj = chunk.owners.pop(n, None)
+        if obj is None:
+            return
+        del chunk.cells[n]
+        self.hash ^= splitmix64(y * self.width + x)
+        mask = ~(1 << lx)
+        chunk.rows[ly] &= mask
+        chunk.map_rows[ly] &= mask
+        chunk.columns[lx] &= ~(1 << ly)
+        self.release(obj)
+        if not chunk.owners:
+            self._free(cx, cy)
+
+    def remove_line(self, y: int) -> None:
+        size = self.chunk
+        cy, ly = divmod(y, size)
+        for cx in list(self.chunk_columns.get(cy, ())):
+            chunk = self.chunks.get((cx, cy))
+            line = chunk.rows[ly] if chunk else 0
+            x = cx * size
+            while line:
+                if line & 1:
+                    self.remove_at(x, y)
+                line >>= 1
+                x += 1
+
+    def check_filled(self, y: int=None, x: int=None) -> bool:
+        if x is not None:
+            return not self.occupied(x, y)
+        size = self.chunk
+        cy, ly = divmod(y, size)
+        width = self.map.width
+        blocks = False
+        for cx in range((width + size - 1) // size):
+            chunk = self.chunks.get((cx, cy))
+            if chunk is None:
+                return False
+            full = (1 << min(size, width - cx * size)) - 1
+            line = chunk.rows[ly]
+            if line & full != full:
+                return False
+            line &= ~chunk.map_rows[ly] & full
+            if line and not self.collidable_blocks(y, line, cx * size):
+                return False
+            blocks = blocks or bool(line)
+        # At least one block which does not belong to the map.
+        return blocks
+
+    def clear_lines(self) -> int:
+        """
+        Same as Field.clear_lines, but only the rows where a tile row
+        filled up are checked, and only the pieces in the tile rows down
+        to the lowest filled line are moved.
+        """
+        rows, self.filled_rows = self.filled_rows, set()
+        full = sorted(y for y in rows if self.check_filled(y=y))
+        if not full:
+            return 0
+        height = self.map.height
+        width = self.map.width
+        last = full[-1] // self.chunk
+        found: Dict[int, GameObject] = {}
+        for cy, cxs in self.chunk_columns.items():
+            if cy <= last:
+                for cx in cxs:
+                    for obj in self.chunks[cx, cy].owners.values():
+                        found[id(obj)] = obj
+        objs = [o for o in found.values()
+                if isinstance(o, Tetrimino) and o.collidable and o.cells]
+        filled = set(full)
+        for obj in objs:
+            self.clear(obj)
+        for obj in objs:
+            cells = []
+            for cell in obj.cells:
+                y = min(max(cell.y, 0), height - 1)
+                if y in filled and cell.y == y and 0 <= cell.x < width:
+                    continue
+                # Number of removed lines below the row.
+                cell.y += len(full) - bisect.bisect_right(full, y)
+                cells.append(cell)
+            obj.cells = cells
+        for obj in objs:
+            self.update(obj)
+        return len(full)
+
+    def debug_print(self) -> None:
+        if not logger.isEnabledFor(Level.DEBUG):
+            return
+        logger.debug('%d chunks of %dx%d', len(self.chunks), self.chunk,
+                     self.chunk)
@@ -1,16 +1,46 @@
 import abc
+import array
 import enum
+import math
 import random
 import pathlib
-from typing import List, Dict, Tuple, Union, Callable  # noqa
-from termbox import (DEFAULT, BLACK, RED, GREEN, YELLOW, BLUE,  # type: ignore
-                     MAGENTA, CYAN, WHITE, KEY_ESC,
-                     KEY_INSERT, KEY_DELETE, KEY_HOME, KEY_END,
-                     KEY_PGUP, KEY_PGDN, KEY_ARROW_UP, KEY_ARROW_DOWN,
-                     KEY_ARROW_LEFT, KEY_ARROW_RIGHT, KEY_MOUSE_LEFT,
-                     KEY_MOUSE_RIGHT, KEY_MOUSE_MIDDLE, KEY_MOUSE_RELEASE,
-                     KEY_MOUSE_WHEEL_UP, KEY_MOUSE_WHEEL_DOWN,
-                     KEY_ENTER, KEY_SPACE, Termbox)
+import time
+from typing import List, Dict, Tuple, Union, Callable, Iterable, \
+    Iterator, Optional  # noqa
+try:
+    from termbox import (DEFAULT, BLACK, RED, GREEN,  # type: ignore
+                         YELLOW, BLUE, MAGENTA, CYAN, WHITE, KEY_ESC,
+                         KEY_INSERT, KEY_DELETE, KEY_HOME, KEY_END,
+                         KEY_PGUP, KEY_PGDN, KEY_ARROW_UP, KEY_ARROW_DOWN,
+                         KEY_ARROW_LEFT, KEY_ARROW_RIGHT, KEY_MOUSE_LEFT,
+                         KEY_MOUSE_RIGHT, KEY_MOUSE_MIDDLE, KEY_MOUSE_RELEASE,
+                         KEY_MOUSE_WHEEL_UP, KEY_MOUSE_WHEEL_DOWN,
+                         KEY_ENTER, KEY_SPACE, Termbox)
+except ImportError:
+    # Without termbox only headless backends are available. The values
+    # are the ones defined by termbox.
+    Termbox = None
+    (DEFAULT, BLACK, RED, GREEN, YELLOW, BLUE, MAGENTA, CYAN,
+     WHITE) = range(9)
+    KEY_INSERT = 0xFFFF - 12
+    KEY_DELETE = 0xFFFF - 13
+    KEY_HOME = 0xFFFF - 14
+    KEY_END = 0xFFFF - 15
+    KEY_PGUP = 0xFFFF - 16
+    KEY_PGDN = 0xFFFF - 17
+    KEY_ARROW_UP = 0xFFFF - 18
+    KEY_ARROW_DOWN = 0xFFFF - 19
+    KEY_ARROW_LEFT = 0xFFFF - 20
+    KEY_ARROW_RIGHT = 0xFFFF - 21
+    KEY_MOUSE_LEFT = 0xFFFF - 22
+    KEY_MOUSE_RIGHT = 0xFFFF - 23
+    KEY_MOUSE_MIDDLE = 0xFFFF - 24
+    KEY_MOUSE_RELEASE = 0xFFFF - 25
+    KEY_MOUSE_WHEEL_UP = 0xFFFF - 26
+    KEY_MOUSE_WHEEL_DOWN = 0xFFFF - 27
+    KEY_ENTER = 0x0D
+    KEY_ESC = 0x1B
+    KEY_SPACE = 0x20
 from .logging import create_logger
 from .exceptions import Exit
 
@@ -89,6 +119,8 @@ class Cell:
     """
     Cell object.
     """
+    __slots__ = ('c', 'x', 'y', 'fg', 'bg', 'scale')
+
     def __init__(self, x: int=None, y: int=None, fg: Color=None,
                  bg: Color=None, c: int=None, scale: bool=True) -> None:
         self.c: int = c or Shape.Default.value
@@ -102,6 +134,67 @@ class Cell:
         return f'Cell: x={self.x},y={self.y},c={self.c}'
 
 
+class CellBuffer:
+    """
+    Compact storage of many cells, one array per attribute.
+    """
+    __slots__ = ('x', 'y', 'c', 'fg', 'bg', 'scale', 'version')
+
+    def __init__(self, cells: Iterable[Cell]=None, scale: bool=True) -> None:
+        self.x = array.array('h')
+        self.y = array.array('h')
+        self.c = array.array('i')
+        self.fg = array.array('h')
+        self.bg = array.array('h')
+        self.scale: bool = scale
+        # Incremented whenever the cells change.
+        self.version: int = 0
+        for cell in cells or []:
+            self.append(cell.x, cell.y, cell.fg, cell.bg, cell.c)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __iter__(self) -> Iterator[Cell]:
+        for n in range(len(self.x)):
+            yield self[n]
+
+    def __getitem__(self, n: int) -> Cell:
+        return Cell(self.x[n], self.y[n], Color(self.fg[n]),
+                    Color(self.bg[n]), self.c[n], scale=self.scale)
+
+    def __repr__(self) -> str:
+        return f'CellBuffer: n={len(self)}'
+
+    def append(self, x: int, y: int, fg: Color=None, bg: Color=None,
+               c: int=None) -> None:
+        self.x.append(x)
+        self.y.append(y)
+        self.c.append(c or Shape.Default.value)
+        self.fg.append(fg or Color.Default)
+        self.bg.append(bg or Color.Default)
+        self.version += 1
+
+    def clear(self) -> None:
+        for a in (self.x, self.y, self.c, self.fg, self.bg):
+            del a[:]
+        self.version += 1
+
+
+Cells = Union[List[Cell], CellBuffer]
+
+KeyEvent = Optional[Tuple[Optional[int], Optional[str]]]
+
+
+def cell_positions(cells: Cells) -> Iterable[Tuple[int, int]]:
+    """
+    Iterate (x, y) of cells without materializing buffered cells.
+    """
+    if isinstance(cells, CellBuffer):
+        return zip(cells.x, cells.y)
+    return ((cell.x, cell.y) for cell in cells)
+
+
 def render_objects(tm: 'Terminal', *objects):
     """
     Render objects in terminal.
@@ -117,19 +210,68 @@ def render_objects(tm: 'Terminal', *objects):
         o.render(tm)
 
 
-def render_cells(tm: 'Terminal', cells: List[Cell]) -> None:
+def render_cells(tm: 'Terminal', cells: Cells) -> None:
     """
     Render cells in terminal.
     """
     if not tm.tb:
         raise RuntimeError('Null termbox')
+    if isinstance(cells, CellBuffer):
+        render_buffer(tm, cells)
+        return
+    change_cell = tm.change_cell
     for cell in cells:
-        for scaled in scale_cells(cell):
-            tm.tb.change_cell(scaled.x, scaled.y,
-                              scaled.c, scaled.fg, scaled.bg)
+        if not cell.scale:
+            change_cell(cell.x, cell.y, cell.c, cell.fg, cell.bg)
+            continue
+        x = cell.x * SCALEX
+        y = cell.y * SCALEY
+        for sx in range(SCALEX):
+            for sy in range(SCALEY):
+                change_cell(x+sx, y+sy, cell.c, cell.fg, cell.bg)
+
+
+def render_buffer(tm: 'Terminal', cells: CellBuffer) -> None:
+    """
+    Render buffered cells in terminal.
+    """
+    change_cell = tm.change_cell
+    columns = zip(cells.x, cells.y, cells.c, cells.fg, cells.bg)
+    if not cells.scale:
+        for x, y, c, fg, bg in columns:
+            change_cell(x, y, c, fg, bg)
+        return
+    for x, y, c, fg, bg in columns:
+        x *= SCALEX
+        y *= SCALEY
+        for sx in range(SCALEX):
+            for sy in range(SCALEY):
+                change_cell(x+sx, y+sy, c, fg, bg)
+
+
+def scale_buffer(cells: CellBuffer, width: int=None,
+                 height: int=None) -> CellBuffer:
+    """
+    Make a buffer of the cells as they appear on the terminal, leaving out
+    the ones outside of a `width` x `height` window.
+    """
+    scaled = CellBuffer(scale=False)
+    scalex, scaley = (SCALEX, SCALEY) if cells.scale else (1, 1)
+    # Bounds of the window in unscaled positions.
+    right = None if width is None else -(-width // scalex)
+    bottom = None if height is None else -(-height // scaley)
+    for x, y, c, fg, bg in zip(cells.x, cells.y, cells.c,
+                               cells.fg, cells.bg):
+        if x < 0 or y < 0 or (right is not None and x >= right) \
+                or (bottom is not None and y >= bottom):
+            continue
+        for sx in range(scalex):
+            for sy in range(scaley):
+                scaled.append(x*scalex+sx, y*scaley+sy, fg, bg, c)
+    return scaled
 
 
-def scale_cells(cells: Union[Cell, List[Cell]]) -> List[Cell]:
+def scale_cells(cells: Union[Cell, Cells]) -> List[Cell]:
     if isinstance(cells, Cell):
         cells = [cells]
 
@@ -173,6 +315,10 @@ class Renderable:
     """
     __metaclass__ = abc.ABCMeta
 
+    # Static objects keep a scaled copy of their cells, rebuilt only when
+    # the cells change.
+    static = False
+
     def __init__(self, x: int=None, y: int=None, fg: Color=Color.Default,
                  bg: Color=Color.Default) -> None:
         self.pos: Vector2 = Vector2(x, y)
@@ -180,16 +326,33 @@ class Renderable:
         self.fg: Color = fg
         self.bg: Color = bg
         self.collidable = True
+        self._scaled: CellBuffer = None
+        self._scaled_key: Tuple[int, int, int, int] = None
 
     def render(self, tm: 'Terminal'=None, dx: int=0, dy: int=0,
                check_intersect: bool=True) -> None:
         """
         Render object.
         """
-        render_cells(tm, self.make_cells())
+        cells = self.make_cells()
+        if self.static and isinstance(cells, CellBuffer):
+            cells = self.scaled_cells(cells, tm.width, tm.height)
+        render_cells(tm, cells)
+
+    def scaled_cells(self, cells: CellBuffer, width: int=None,
+                     height: int=None) -> CellBuffer:
+        """
+        Get the cached scaled copy of the `cells` within a `width` x
+        `height` window.
+        """
+        key = (id(cells), cells.version, width, height)
+        if self._scaled_key != key:
+            self._scaled = scale_buffer(cells, width, height)
+            self._scaled_key = key
+        return self._scaled
 
     @abc.abstractmethod
-    def make_cells(self) -> List[Cell]:
+    def make_cells(self) -> Cells:
         pass
 
     def set_color(self, fg: Color, bg: Color):
@@ -258,18 +421,71 @@ class MouseKey(enum.Enum):
     z = 'z'
 
 
+class Backend:
+    """
+    Terminal backend interface. `termbox.Termbox` implements it.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def width(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def height(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def change_cell(self, x: int, y: int, c: int, fg: int, bg: int) -> None:
+        pass
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def present(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def peek_event(self, timeout: int=0) -> Optional[Tuple]:
+        """
+        Wait for an event up to `timeout` milliseconds. Return termbox's
+        (type, uch, key, mod, w, h, x, y) tuple, or None.
+        """
+        pass
+
+    @abc.abstractmethod
+    def poll_event(self) -> Optional[Tuple]:
+        pass
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        pass
+
+
 class Terminal:
     """
     Terminal class.
     """
     TermboxCls = Termbox
 
-    def __init__(self, debug=False) -> None:
-        self.tb = self.TermboxCls()
+    def __init__(self, debug=False, backend: Backend=None) -> None:
+        if backend is None:
+            if self.TermboxCls is None:
+                raise RuntimeError('termbox is not installed, '
+                                   'use a headless backend')
+            backend = self.TermboxCls()
+        self.tb = backend
         logger.debug("init {}".format(self.tb))
         self.debug = debug
         self._keydown_handlers: Dict[MouseKey, Callable] = {}
         self._on_shutdown: Callable = None
+        # Frame being rendered and the last frame presented. Keys are
+        # `y << 16 | x`, values are `c | fg << 21 | bg << 37`, with room
+        # for the 16-bit termbox attributes, e.g. bold, in fg and bg.
+        self._back: Dict[int, int] = {}
+        self._front: Dict[int, int] = {}
 
     def __enter__(self) -> 'Terminal':
         logger.debug("entering {}".format(self.tb))
@@ -298,13 +514,12 @@ class Terminal:
             self._keydown_handlers.update({key.value: cb})
 
     def get_keydown_handler(self, key: MouseKey) -> Callable:
-        logger.debug(f'get key handler for {key}.')
         handler = self._keydown_handlers.get(key)
         if handler:
-            logger.debug(f'key handler found for {key}.')
+            logger.debug('key handler found for %s.', key)
             return handler
         else:
-            logger.debug(f'key handler not found for {key}.')
+            logger.debug('key handler not found for %s.', key)
             return None
 
     @property
@@ -315,6 +530,14 @@ class Terminal:
     def on_shutdown(self, f: Callable) -> None:
         self._on_shutdown = f
 
+    @property
+    def clock(self) -> Callable[[], float]:
+        """
+        Clock of the backend. Backends driving their own time, such as the
+        headless one, provide it as `clock`.
+        """
+        return getattr(self.tb, 'clock', time.monotonic)
+
     @property
     def width(self) -> int:
         return self.tb.width()
@@ -328,44 +551,99 @@ class Terminal:
         Clear the console
         """
         self.tb.clear()
+        self._back.clear()
+        self._front.clear()
+
+    def change_cell(self, x: int, y: int, c: int, fg: Color,
+                    bg: Color) -> None:
+        """
+        Draw a cell into the frame being rendered. Cells off the top or
+        left of the console, or too far off to be keyed, are clipped.
+        """
+        if not (0 <= x < 1 << 16 and y >= 0):
+            return
+        self._back[y << 16 | x] = c | fg << 21 | bg << 37
+
+    def present(self) -> bool:
+        """
+        Send the cells which differ from the last presented frame to the
+        console. Return False if the frame was identical.
+        """
+        back = self._back
+        front = self._front
+        change_cell = self.tb.change_cell
+        changed = False
+        for pos, cell in back.items():
+            if front.get(pos) != cell:
+                change_cell(pos & 0xffff, pos >> 16, cell & 0x1fffff,
+                            cell >> 21 & 0xffff, cell >> 37)
+                changed = True
+        for pos in front:
+            if pos not in back:
+                change_cell(pos & 0xffff, pos >> 16, DEFAULT_SQUARE,
+                            DEFAULT_COLOR, DEFAULT_COLOR)
+                changed = True
+        self._front = back
+        self._back = front
+        self._back.clear()
+        if changed:
+            self.tb.present()
+        return changed
 
     def update(self, now, *objects) -> None:
         """
         Render any renderable object on the console.
         """
-        self.clear()
-        self.peek_key_event()
         render_objects(self, *objects)
-        self.tb.present()
+        self.present()
 
-    def peek_key_event(self) -> None:
+    def peek_key_event(self, timeout: float=0) -> None:
+        """
+        Wait for a key event up to `timeout` seconds and dispatch it.
+        """
+        event = self.poll_key_event(timeout)
+        if event:
+            self.dispatch_key_event(*event)
+
+    def poll_key_event(self, timeout: Optional[float]=0) -> KeyEvent:
+        """
+        Wait for a key event up to `timeout` seconds, forever if `timeout`
+        is None. Return (key, uch), or None if nothing happened.
+        """
         try:
             if not self.tb:
                 raise RuntimeError('Null termbox')
 
-            type_, uch, key, mod, w, h, x, y = self.tb.peek_event()
-            logger.debug(f'type:{type_},uch={uch},key={key},mod={mod},'
-                         f'w={w},h={h},x={x},y={y}')
-            if key is not None:
-                cb = self.get_keydown_handler(key)
-                if cb:
-                    cb(key)
-                if key == KEY_ESC:
-                    self.close()
-                    if self.on_shutdown:
-                        self.on_shutdown()
-                    raise Exit()
-            if uch:
-                cb = self.get_keydown_handler(uch)
-                if cb:
-                    cb(key)
+            if timeout is None:
+                event = self.tb.poll_event()
+            else:
+                event = self.tb.peek_event(math.ceil(timeout * 1000))
+            type_, uch, key, mod, w, h, x, y = event
+            logger.debug('type:%s,uch=%s,key=%s,mod=%s,w=%s,h=%s,x=%s,y=%s',
+                         type_, uch, key, mod, w, h, x, y)
+            return key, uch
 
         except TypeError as e:
-            pass
-
-        except Exit:
-            raise
+            return None
 
         except Exception as e:
             logger.error(e)
             raise
+
+    def dispatch_key_event(self, key: int, uch: str=None) -> None:
+        """
+        Call the keydown handlers registered for a key event.
+        """
+        if key is not None:
+            cb = self.get_keydown_handler(key)
+            if cb:
+                cb(key)
+            if key == KEY_ESC:
+                self.close()
+                if self.on_shutdown:
+                    self.on_shutdown()
+                raise Exit()
+        if uch:
+            cb = self.get_keydown_handler(uch)
+            if cb:
+                cb(key)